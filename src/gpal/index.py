@@ -11,15 +11,21 @@ import asyncio
 import hashlib
 import inspect
 import os
+import re
+import tempfile
 import time
-from collections.abc import Awaitable, Callable
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Union
 
 import chromadb
+import numpy as np
+import orjson
 import pathspec
 from google import genai
-from google.genai import errors as genai_errors
+from google.genai import errors as genai_errors, types
 import logging
 
 from tenacity import (
@@ -45,15 +51,43 @@ def _is_retriable_genai_error(exc: BaseException) -> bool:
 # ─────────────────────────────────────────────────────────────────────────────
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB - matches server.py
+WHOLE_READ_MAX = 1024 * 1024  # Files up to this size are chunked from one read()
+BINARY_SNIFF_CHARS = 4096  # A NUL in this much of the head marks a file as binary
 CHUNK_SIZE = 50  # lines per chunk
 CHUNK_OVERLAP = 10  # overlapping lines between chunks
 EMBEDDING_MODEL = "gemini-embedding-001"  # Newer model, text-embedding-004 deprecated Jan 2026
 EMBEDDING_BATCH_SIZE = 100  # Max chunks per Gemini API call
+EMBEDDING_DIM = 512  # Matryoshka-truncated output size (full model output is 3072)
 
 # Rate limiting and retry configuration
 RATE_LIMIT_DELAY = 0.05  # 50ms between batches
 MAX_RETRIES = 5  # Max retry attempts on failure
 MAX_CONCURRENT_EMBEDS = 10  # Max concurrent embedding requests
+MAX_READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # Threads reading/chunking files
+REBUILD_GROUP_FILES = 200  # Files embedded and written to chromadb together during rebuild
+
+# Batch API (rebuild_batch): half-price embeddings, minutes-to-hours latency
+BATCH_POLL_INITIAL = 10.0  # seconds before the first status check
+BATCH_POLL_MAX = 300.0  # cap for exponential poll backoff
+_BATCH_DONE_STATES = {
+    "JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED",
+}
+
+# HNSW graph tuning for the chunk collection (fixed when the collection is
+# created, so changes here only apply after a force rebuild)
+HNSW_M = 16  # neighbors per node
+HNSW_CONSTRUCTION_EF = 128  # candidate list size while inserting
+HNSW_SEARCH_EF = 64  # candidate list size while querying
+
+# Chunk collection settings; embedding_dim lets a rebuild detect a size change
+_CODE_COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": HNSW_M,
+    "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+    "hnsw:search_ef": HNSW_SEARCH_EF,
+    "embedding_dim": EMBEDDING_DIM,
+}
 
 # Binary/generated file extensions to skip
 BINARY_EXTENSIONS = {
@@ -66,6 +100,16 @@ BINARY_EXTENSIONS = {
     ".whl", ".egg",
     ".min.js", ".min.css",  # minified files
 }
+# Tuple form so str.endswith() checks every suffix in one C-level call; for a
+# set this small that beats a compiled regex or a per-name suffix set lookup
+_BINARY_SUFFIXES = tuple(sorted(BINARY_EXTENSIONS))
+
+# Parsed .gitignore per file path: ((mtime_ns, size), spec, union regex).
+# get_index() may build several CodebaseIndex objects for one root over a
+# server's lifetime; an unchanged .gitignore is parsed and compiled once.
+_GITIGNORE_CACHE: dict[
+    str, tuple[tuple[int, int], pathspec.PathSpec, re.Pattern[str] | None]
+] = {}
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -73,6 +117,92 @@ BINARY_EXTENSIONS = {
 # ─────────────────────────────────────────────────────────────────────────────
 
 
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length in place (truncated Matryoshka vectors aren't)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def _response_vectors(response: types.EmbedContentResponse) -> np.ndarray:
+    """Unit-length float32 matrix from an embed_content response."""
+    vectors = np.asarray([e.values for e in response.embeddings], dtype=np.float32)
+    return _normalize_rows(vectors)
+
+
+def _chunk_hash(text: str) -> str:
+    """Content hash stored with each chunk to skip re-embedding unchanged text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _compile_ignore_union(spec: pathspec.PathSpec) -> re.Pattern[str] | None:
+    """
+    Fold a gitignore spec into one alternation regex.
+
+    Only valid when the spec has no negated (!) patterns: then a path is
+    ignored iff any pattern matches, which a single compiled regex answers
+    in one match() call instead of one per pattern. Returns None when the
+    spec needs pathspec's last-match-wins evaluation.
+    """
+    regexes = []
+    for pattern in spec.patterns:
+        if pattern.include is None:
+            continue  # blank line or comment
+        if not pattern.include:
+            return None
+        regexes.append(f"(?:{pattern.regex.pattern})")
+    if not regexes:
+        return None
+    try:
+        return re.compile("|".join(regexes))
+    except re.error:
+        return None  # e.g. duplicate group names; let pathspec match
+
+
+def _stat_changed(st: os.stat_result, stored: dict | None) -> bool:
+    """True if a file was never indexed or its mtime/size differ from stored metadata."""
+    if stored is None:
+        return True
+    return st.st_mtime != stored.get("mtime", 0) or st.st_size != stored.get("size", -1)
+
+
+def _chunk_ranges(n_lines: int) -> list[tuple[int, int]]:
+    """
+    0-based half-open (start, end) line ranges that _chunk_file produces.
+
+    Windows of CHUNK_SIZE lines start every CHUNK_SIZE - CHUNK_OVERLAP
+    lines; the last one ends at n_lines. Lets callers that only need
+    chunk boundaries (dry runs) skip building chunk text.
+    """
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+    ranges = []
+    start = 0
+    while start < n_lines:
+        end = min(start + CHUNK_SIZE, n_lines)
+        ranges.append((start, end))
+        if end == n_lines:
+            break
+        start += step
+    return ranges
+
+
+def _make_chunk(rel_path: str, start_line: int, lines: Sequence[str]) -> dict:
+    """Build a chunk dict (id, text, metadata) from consecutive lines."""
+    text = "\n".join(lines)
+    end_line = start_line + len(lines) - 1
+    return {
+        "id": f"{rel_path}:{start_line}-{end_line}",
+        "text": text,
+        "metadata": {
+            "file": rel_path,
+            "start_line": start_line,
+            "end_line": end_line,
+            "hash": _chunk_hash(text),
+        },
+    }
+
+
 def get_index_path() -> Path:
     """Get XDG-compliant path for index storage."""
     xdg_data = os.environ.get("XDG_DATA_HOME")
@@ -111,10 +241,15 @@ class CodebaseIndex:
         # Ensure directory exists
         self.db_path.mkdir(parents=True, exist_ok=True)
 
-        self.chroma = chromadb.PersistentClient(path=str(self.db_path))
+        # Telemetry off: chroma otherwise builds and queues a product event
+        # for every add/upsert/query call, which adds up over a rebuild
+        self.chroma = chromadb.PersistentClient(
+            path=str(self.db_path),
+            settings=chromadb.Settings(anonymized_telemetry=False),
+        )
         self.collection = self.chroma.get_or_create_collection(
             name="code",
-            metadata={"hnsw:space": "cosine"},
+            metadata=_CODE_COLLECTION_METADATA,
         )
         # Metadata collection for incremental indexing
         self.meta_collection = self.chroma.get_or_create_collection(
@@ -123,19 +258,46 @@ class CodebaseIndex:
         self._load_gitignore()
 
     def _path_hash(self) -> str:
-        """Generate a unique hash for this project root."""
-        return hashlib.md5(str(self.root).encode()).hexdigest()[:12]
+        """
+        Generate a unique hash for this project root.
+
+        Stays MD5 so existing index directories keep their names (a new
+        hash would orphan them and force a full re-embed);
+        usedforsecurity=False keeps it working under FIPS-mode OpenSSL.
+        """
+        return hashlib.md5(str(self.root).encode(), usedforsecurity=False).hexdigest()[:12]
 
     def _load_gitignore(self) -> None:
         """Load .gitignore patterns for filtering files."""
         self.ignore_spec: pathspec.PathSpec | None = None
+        self._ignore_re: re.Pattern[str] | None = None
         gitignore = self.root / ".gitignore"
-        if gitignore.exists():
+        try:
+            st = gitignore.stat()
+        except OSError:
+            return  # No .gitignore: nothing is ignored
+
+        # Compiled once per file version; _is_ignored only runs the regexes
+        key = str(gitignore)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = _GITIGNORE_CACHE.get(key)
+        if cached is None or cached[0] != stamp:
             try:
                 patterns = gitignore.read_text(encoding="utf-8").splitlines()
-                self.ignore_spec = pathspec.PathSpec.from_lines("gitignore", patterns)
             except (OSError, UnicodeDecodeError):
-                pass  # If we can't read .gitignore, just skip it
+                return  # Unreadable .gitignore: nothing is ignored
+            spec = pathspec.PathSpec.from_lines("gitignore", patterns)
+            cached = (stamp, spec, _compile_ignore_union(spec))
+            _GITIGNORE_CACHE[key] = cached
+        _, self.ignore_spec, self._ignore_re = cached
+
+    def _is_ignored(self, rel_path: str) -> bool:
+        """Check a root-relative POSIX path (trailing / for dirs) against .gitignore."""
+        if self._ignore_re is not None:
+            return self._ignore_re.match(rel_path) is not None
+        if self.ignore_spec is not None:
+            return self.ignore_spec.match_file(rel_path)
+        return False
 
     def _should_index(self, path: Path) -> bool:
         """
@@ -144,8 +306,10 @@ class CodebaseIndex:
         Skips:
         - Hidden files/directories (starting with .)
         - Binary files
-        - Files over MAX_FILE_SIZE
         - Files matching .gitignore patterns
+        - Files over MAX_FILE_SIZE
+
+        The path-only checks run first, so a rejected file costs no stat.
         """
         try:
             rel = path.relative_to(self.root)
@@ -157,8 +321,11 @@ class CodebaseIndex:
             return False
 
         # Skip binary extensions (check full filename for multi-part like .min.js)
-        name = path.name.lower()
-        if any(name.endswith(ext) for ext in BINARY_EXTENSIONS):
+        if path.name.lower().endswith(_BINARY_SUFFIXES):
+            return False
+
+        # Check .gitignore patterns
+        if self._is_ignored(rel.as_posix()):
             return False
 
         # Skip large files
@@ -168,12 +335,49 @@ class CodebaseIndex:
         except OSError:
             return False
 
-        # Check .gitignore patterns
-        if self.ignore_spec and self.ignore_spec.match_file(str(rel)):
-            return False
-
         return True
 
+    def _walk_files(self) -> Iterator[tuple[str, str, os.stat_result]]:
+        """
+        Yield (path, rel_path, stat) for every indexable file under the root.
+
+        Applies the same rules as _should_index, but walks with os.scandir so
+        hidden and gitignored directories are pruned without being entered,
+        and each file is stat'ed once (the result is reused for the
+        incremental mtime/size check). Symlinked directories are not followed.
+        Paths are yielded as plain strings from the scandir entries; callers
+        build a Path only for the files they actually go on to read.
+        """
+        stack = [(str(self.root), "")]
+        while stack:
+            dir_path, prefix = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+
+            for entry in entries:
+                name = entry.name
+                if name.startswith("."):
+                    continue
+                rel = prefix + name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not self._is_ignored(rel + "/"):
+                            stack.append((entry.path, rel + "/"))
+                        continue
+                    if not entry.is_file():
+                        continue
+                    if name.lower().endswith(_BINARY_SUFFIXES) or self._is_ignored(rel):
+                        continue
+                    st = entry.stat()  # only for files that pass the name checks
+                except OSError:
+                    continue
+                if st.st_size > MAX_FILE_SIZE:
+                    continue
+                yield entry.path, rel, st
+
     def _get_file_metadata(self, path: Path) -> dict | None:
         """Get stored metadata for a file, or None if not indexed."""
         try:
@@ -194,21 +398,24 @@ class CodebaseIndex:
         Returns True if:
         - File has never been indexed
         - File mtime or size has changed since last index
+
+        The rebuild walk doesn't call this: it reuses each DirEntry.stat()
+        from _walk_files and compares against one bulk metadata query.
         """
         try:
             stat = path.stat()
         except OSError:
             return False
 
-        stored = self._get_file_metadata(path)
-        if stored is None:
-            return True
+        return _stat_changed(stat, self._get_file_metadata(path))
 
-        # Compare mtime and size
-        stored_mtime = stored.get("mtime", 0)
-        stored_size = stored.get("size", -1)
-
-        return stat.st_mtime != stored_mtime or stat.st_size != stored_size
+    def _get_all_file_metadata(self) -> dict[str, dict]:
+        """Stored metadata for every indexed file, keyed by relative path (one query)."""
+        result = self.meta_collection.get(include=["metadatas"])
+        return {
+            file_id: meta or {}
+            for file_id, meta in zip(result.get("ids") or [], result.get("metadatas") or [])
+        }
 
     def _update_file_metadata(self, path: Path, chunk_count: int) -> None:
         """Store metadata for a file after successful indexing."""
@@ -245,11 +452,160 @@ class CodebaseIndex:
         if existing["ids"]:
             self.collection.delete(ids=existing["ids"])
 
-        # Delete metadata
+        self._remove_file_metadata(rel_path)
+
+    def _remove_file_metadata(self, rel_path: str) -> None:
+        """Forget a file's index metadata so the next rebuild re-checks it."""
         meta_existing = self.meta_collection.get(ids=[rel_path])
         if meta_existing["ids"]:
             self.meta_collection.delete(ids=[rel_path])
 
+    def _plan_chunk_update(
+        self, rel_path: str, chunks: list[dict]
+    ) -> tuple[list[dict], list[dict], np.ndarray, list[str]]:
+        """
+        Compare freshly chunked text against what the index holds for a file.
+
+        Chunks stored under the same id with the same content hash are left
+        alone. Chunks whose text is already embedded under another id (e.g.
+        shifted down by an edit above them) reuse the stored vector.
+
+        Returns:
+            (to_embed, reused, reused_embeddings, stale_ids) where to_embed
+            need new embeddings, reused pair up with the rows of
+            reused_embeddings, and stale_ids are stored chunks the file no
+            longer produces.
+        """
+        existing = self.collection.get(
+            where={"file": rel_path}, include=["metadatas", "embeddings"], limit=None
+        )
+        stored_ids = existing.get("ids") or []
+        stored_metas = existing.get("metadatas") or []
+        stored_embeddings = existing.get("embeddings")
+        if stored_embeddings is None:
+            stored_embeddings = []
+
+        stored_hashes: dict[str, str | None] = {}
+        embedding_by_hash: dict[str, np.ndarray] = {}
+        for chunk_id, meta, embedding in zip(stored_ids, stored_metas, stored_embeddings):
+            chunk_hash = (meta or {}).get("hash")
+            stored_hashes[chunk_id] = chunk_hash
+            if chunk_hash:
+                embedding_by_hash.setdefault(chunk_hash, np.asarray(embedding, dtype=np.float32))
+
+        to_embed: list[dict] = []
+        reused: list[dict] = []
+        reused_embeddings: list[np.ndarray] = []
+        for c in chunks:
+            chunk_hash = c["metadata"]["hash"]
+            if stored_hashes.get(c["id"]) == chunk_hash:
+                continue
+            if chunk_hash in embedding_by_hash:
+                reused.append(c)
+                reused_embeddings.append(embedding_by_hash[chunk_hash])
+            else:
+                to_embed.append(c)
+
+        new_ids = {c["id"] for c in chunks}
+        stale_ids = [i for i in stored_ids if i not in new_ids]
+        reused_matrix = (
+            np.stack(reused_embeddings)
+            if reused_embeddings
+            else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        )
+        return to_embed, reused, reused_matrix, stale_ids
+
+    def _store_chunks(
+        self,
+        chunks: list[dict],
+        embeddings: np.ndarray,
+        stale_ids: list[str],
+    ) -> None:
+        """Delete stale chunk ids and upsert new or changed chunks (one row each)."""
+        if stale_ids:
+            self.collection.delete(ids=stale_ids)
+        if chunks:
+            self.collection.upsert(
+                ids=[c["id"] for c in chunks],
+                documents=[c["text"] for c in chunks],
+                embeddings=embeddings,
+                metadatas=[c["metadata"] for c in chunks],
+            )
+
+    def _plan_group(
+        self, paths: list[Path], chunk_lists: list[list[dict]]
+    ) -> tuple[list[dict], list[dict], np.ndarray, list[str], list[tuple[Path, int]]]:
+        """
+        Plan chunk updates for a group of files that are written together.
+
+        Drops the files' metadata first (one delete), so a failure before
+        _write_group leaves them all marked for re-indexing.
+
+        Returns:
+            (to_embed, reused, reused_embeddings, stale_ids, chunk_counts)
+            combined across the group; see _plan_chunk_update.
+        """
+        rel_paths = [str(p.relative_to(self.root)) for p in paths]
+        self.meta_collection.delete(ids=rel_paths)
+
+        to_embed: list[dict] = []
+        reused: list[dict] = []
+        reused_embeddings = [np.empty((0, EMBEDDING_DIM), dtype=np.float32)]
+        stale_ids: list[str] = []
+        for rel_path, chunks in zip(rel_paths, chunk_lists):
+            file_embed, file_reused, file_vectors, file_stale = self._plan_chunk_update(
+                rel_path, chunks
+            )
+            to_embed.extend(file_embed)
+            reused.extend(file_reused)
+            reused_embeddings.append(file_vectors)
+            stale_ids.extend(file_stale)
+
+        counts = [(p, len(c)) for p, c in zip(paths, chunk_lists)]
+        return to_embed, reused, np.concatenate(reused_embeddings), stale_ids, counts
+
+    def _write_group(
+        self,
+        chunks: list[dict],
+        embeddings: np.ndarray,
+        stale_ids: list[str],
+        chunk_counts: list[tuple[Path, int]],
+    ) -> None:
+        """
+        Write a planned group to chromadb with as few calls as possible.
+
+        Every collection write is a persistence round-trip, so deletes,
+        upserts and file metadata are each sent in slices of chromadb's
+        max batch size instead of once per file.
+        """
+        max_batch = self.chroma.get_max_batch_size()
+        for i in range(0, len(stale_ids), max_batch):
+            self.collection.delete(ids=stale_ids[i : i + max_batch])
+        for i in range(0, len(chunks), max_batch):
+            batch = chunks[i : i + max_batch]
+            self.collection.upsert(
+                ids=[c["id"] for c in batch],
+                documents=[c["text"] for c in batch],
+                embeddings=embeddings[i : i + max_batch],
+                metadatas=[c["metadata"] for c in batch],
+            )
+
+        ids: list[str] = []
+        metadatas: list[dict] = []
+        for path, chunk_count in chunk_counts:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Vanished mid-rebuild; the next rebuild drops it
+            ids.append(str(path.relative_to(self.root)))
+            metadatas.append({"mtime": stat.st_mtime, "size": stat.st_size, "chunk_count": chunk_count})
+        for i in range(0, len(ids), max_batch):
+            self.meta_collection.upsert(
+                ids=ids[i : i + max_batch],
+                metadatas=metadatas[i : i + max_batch],
+                documents=[""] * len(ids[i : i + max_batch]),
+            )
+
     def _remove_stale_files(self, current_files: set[str]) -> int:
         """
         Remove files from index that no longer exist on disk.
@@ -264,49 +620,152 @@ class CodebaseIndex:
         all_meta = self.meta_collection.get(limit=None)
         indexed_files = set(all_meta["ids"]) if all_meta["ids"] else set()
 
-        # Find stale files
-        stale = indexed_files - current_files
-        for rel_path in stale:
-            self._remove_file_from_index(rel_path)
+        # Find stale files; delete their chunks and metadata in bulk
+        stale = sorted(indexed_files - current_files)
+        max_batch = self.chroma.get_max_batch_size()
+        for i in range(0, len(stale), max_batch):
+            batch = stale[i : i + max_batch]
+            self.collection.delete(where={"file": {"$in": batch}})
+            self.meta_collection.delete(ids=batch)
 
         return len(stale)
 
+    def _reset_collections(self) -> None:
+        """Drop and recreate the chunk and file-metadata collections."""
+        self.chroma.delete_collection("code")
+        self.collection = self.chroma.create_collection(
+            name="code",
+            metadata=_CODE_COLLECTION_METADATA,
+        )
+        self.chroma.delete_collection("file_metadata")
+        self.meta_collection = self.chroma.create_collection(
+            name="file_metadata",
+        )
+
+    def _collect_files(self, force: bool = False) -> tuple[list[Path], set[str]]:
+        """
+        Walk the project root and find indexable files.
+
+        Args:
+            force: If True, every indexable file is returned for indexing,
+                   not just the ones whose mtime/size changed.
+
+        Returns:
+            (files_to_index, current_files) where current_files holds the
+            relative path of every indexable file (for stale removal).
+        """
+        files_to_index: list[Path] = []
+        current_files: set[str] = set()
+        # One metadata query for the whole walk, not one get() per file
+        stored = {} if force else self._get_all_file_metadata()
+
+        for path, rel_path, st in self._walk_files():
+            current_files.add(rel_path)
+
+            # Check if needs reindex
+            if force or _stat_changed(st, stored.get(rel_path)):
+                files_to_index.append(Path(path))
+
+        return files_to_index, current_files
+
     def _chunk_file(self, path: Path) -> list[dict]:
         """
         Split a file into overlapping chunks with metadata.
 
+        Windows start every CHUNK_SIZE - CHUNK_OVERLAP lines; the last one
+        ends at the final line. Files up to WHOLE_READ_MAX are read in one
+        call, split once, and sliced at _chunk_ranges boundaries (no
+        per-line Python work). Larger files are streamed line by line
+        through a CHUNK_SIZE window, so peak memory is one window rather
+        than the file plus its list of lines.
+
+        Files with a NUL in their first BINARY_SNIFF_CHARS characters are
+        treated as binary and produce no chunks. The check reuses the read
+        that chunking does anyway, so it costs no extra open or syscall.
+
         Returns a list of dicts with id, text, and metadata for each chunk.
         """
+        rel_path = str(path.relative_to(self.root))
+        step = CHUNK_SIZE - CHUNK_OVERLAP
+        window: deque[str] = deque(maxlen=CHUNK_SIZE)
+        chunks: list[dict] = []
+        line_no = 0
+        needed = CHUNK_SIZE  # lines to read before the next full window
+
         try:
-            lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+            with path.open(encoding="utf-8", errors="replace") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size > MAX_FILE_SIZE:
+                    return []  # grew past the limit after it was filtered
+                if size <= WHOLE_READ_MAX:
+                    text = f.read()
+                    if "\x00" in text[:BINARY_SNIFF_CHARS]:
+                        return []  # binary content under a non-binary extension
+                    # Universal newlines already map \r\n and \r to \n
+                    lines = text.split("\n")
+                    if lines[-1] == "":
+                        lines.pop()  # trailing newline (or empty file)
+                    return [
+                        _make_chunk(rel_path, start + 1, lines[start:end])
+                        for start, end in _chunk_ranges(len(lines))
+                    ]
+                if "\x00" in f.read(BINARY_SNIFF_CHARS):
+                    return []
+                f.seek(0)
+                for line in f:
+                    line_no += 1
+                    window.append(line[:-1] if line.endswith("\n") else line)
+                    needed -= 1
+                    if needed == 0:
+                        chunks.append(_make_chunk(rel_path, line_no - CHUNK_SIZE + 1, window))
+                        needed = step
         except OSError:
             return []
 
-        if not lines:
-            return []
+        # Lines past the last full window, plus the overlap preceding them
+        unread = (step if chunks else CHUNK_SIZE) - needed
+        if unread:
+            count = unread + (CHUNK_OVERLAP if chunks else 0)
+            tail = list(window)[-count:]
+            chunks.append(_make_chunk(rel_path, line_no - count + 1, tail))
 
-        rel_path = str(path.relative_to(self.root))
-        chunks = []
+        return chunks
 
-        for i in range(0, len(lines), CHUNK_SIZE - CHUNK_OVERLAP):
-            chunk_lines = lines[i : i + CHUNK_SIZE]
-            if not chunk_lines:
-                continue
+    def _count_chunks(self, path: Path) -> int:
+        """Number of chunks _chunk_file would produce, without building them."""
+        try:
+            with path.open(encoding="utf-8", errors="replace") as f:
+                if "\x00" in f.read(BINARY_SNIFF_CHARS):
+                    return 0
+                f.seek(0)
+                n_lines = sum(1 for _ in f)
+        except OSError:
+            return 0
+        return len(_chunk_ranges(n_lines))
 
-            start_line = i + 1
-            end_line = i + len(chunk_lines)
-
-            chunks.append({
-                "id": f"{rel_path}:{start_line}-{end_line}",
-                "text": "\n".join(chunk_lines),
-                "metadata": {
-                    "file": rel_path,
-                    "start_line": start_line,
-                    "end_line": end_line,
-                },
-            })
+    def _count_all_chunks(self, paths: list[Path]) -> int:
+        """Total chunk count for a dry run, counting files on a thread pool."""
+        if len(paths) <= 1:
+            return sum(self._count_chunks(p) for p in paths)
+        workers = min(MAX_READ_WORKERS, len(paths))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gpal-read") as ex:
+            return sum(ex.map(self._count_chunks, paths))
 
-        return chunks
+    def _chunk_files(self, paths: list[Path]) -> list[list[dict]]:
+        """
+        Chunk many files in parallel on a thread pool.
+
+        File reads and UTF-8 decoding release the GIL, so cold-cache reads
+        overlap instead of running one at a time.
+
+        Returns:
+            Chunk lists in the same order as paths.
+        """
+        if len(paths) <= 1:
+            return [self._chunk_file(p) for p in paths]
+        workers = min(MAX_READ_WORKERS, len(paths))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gpal-read") as ex:
+            return list(ex.map(self._chunk_file, paths))
 
     @retry(
         stop=stop_after_attempt(MAX_RETRIES),
@@ -317,7 +776,7 @@ class CodebaseIndex:
     )
     def _embed_batch(
         self, batch: list[str], task_type: str
-    ) -> list[list[float]]:
+    ) -> np.ndarray:
         """
         Embed a single batch of texts with retry on rate limit.
 
@@ -326,42 +785,67 @@ class CodebaseIndex:
             task_type: Task type for embeddings.
 
         Returns:
-            List of embedding vectors for this batch.
+            float32 array of unit-length vectors, one row per text.
         """
         response = self.client.models.embed_content(
             model=EMBEDDING_MODEL,
             contents=batch,
-            config={"task_type": task_type},
+            config={"task_type": task_type, "output_dimensionality": EMBEDDING_DIM},
         )
         time.sleep(RATE_LIMIT_DELAY)
-        return [e.values for e in response.embeddings]
+        return _response_vectors(response)
 
-    def _embed(self, texts: list[str], task_type: str = "RETRIEVAL_DOCUMENT") -> list[list[float]]:
+    def _embed(
+        self,
+        texts: list[str],
+        task_type: str = "RETRIEVAL_DOCUMENT",
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
         """
         Get embeddings from Gemini for a list of texts.
 
-        Automatically batches requests to stay within API limits.
+        Automatically batches requests to stay within API limits. When there
+        is more than one batch, batches are sent concurrently from a thread
+        pool (up to MAX_CONCURRENT_EMBEDS in flight). Threads rather than
+        asyncio.run() because this is also called from inside a running
+        event loop (_rebuild_sync, AFC tool callbacks).
         Includes retry logic for rate limiting (429) errors.
 
+        Vectors are written into one float32 matrix rather than kept as
+        lists of Python floats (half the memory, no per-float boxing), and
+        chromadb takes the matrix as-is.
+
         Args:
             texts: List of text strings to embed.
             task_type: Either "RETRIEVAL_DOCUMENT" for indexing or
                        "RETRIEVAL_QUERY" for searching.
+            out: Optional (len(texts), EMBEDDING_DIM) float32 array to fill;
+                 allocated when omitted.
 
         Returns:
-            List of embedding vectors.
+            float32 array of unit-length vectors, one row per text.
         """
+        if out is None:
+            out = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
         if not texts:
-            return []
+            return out
+
+        offsets = range(0, len(texts), EMBEDDING_BATCH_SIZE)
 
-        all_embeddings: list[list[float]] = []
+        def embed_into(start: int) -> None:
+            batch = texts[start : start + EMBEDDING_BATCH_SIZE]
+            out[start : start + len(batch)] = self._embed_batch(batch, task_type)
 
-        for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-            batch = texts[i : i + EMBEDDING_BATCH_SIZE]
-            embeddings = self._embed_batch(batch, task_type)
-            all_embeddings.extend(embeddings)
+        if len(offsets) == 1:
+            embed_into(0)
+            return out
 
-        return all_embeddings
+        workers = min(MAX_CONCURRENT_EMBEDS, len(offsets))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gpal-embed") as ex:
+            # Each batch fills its own rows; list() surfaces any exception
+            list(ex.map(embed_into, offsets))
+
+        return out
 
     @retry(
         stop=stop_after_attempt(MAX_RETRIES),
@@ -375,7 +859,7 @@ class CodebaseIndex:
         batch: list[str],
         task_type: str,
         semaphore: asyncio.Semaphore,
-    ) -> list[list[float]]:
+    ) -> np.ndarray:
         """
         Embed a single batch of texts asynchronously with concurrency control.
 
@@ -387,24 +871,24 @@ class CodebaseIndex:
             semaphore: Semaphore for concurrency control.
 
         Returns:
-            List of embedding vectors for this batch.
+            float32 array of unit-length vectors, one row per text.
         """
         async with semaphore:
             # Use the async API client
             response = await self.client.aio.models.embed_content(
                 model=EMBEDDING_MODEL,
                 contents=batch,
-                config={"task_type": task_type},
+                config={"task_type": task_type, "output_dimensionality": EMBEDDING_DIM},
             )
             await asyncio.sleep(RATE_LIMIT_DELAY)
-            return [e.values for e in response.embeddings]
+            return _response_vectors(response)
 
     async def _embed_async(
         self,
         texts: list[str],
         task_type: str,
         semaphore: asyncio.Semaphore,
-    ) -> list[list[float]]:
+    ) -> np.ndarray:
         """
         Get embeddings from Gemini asynchronously.
 
@@ -414,82 +898,29 @@ class CodebaseIndex:
             semaphore: Semaphore for concurrency control.
 
         Returns:
-            List of embedding vectors.
+            float32 array of unit-length vectors, one row per text.
         """
+        out = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
         if not texts:
-            return []
+            return out
 
         # Create batch tasks
-        tasks = []
-        for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-            batch = texts[i : i + EMBEDDING_BATCH_SIZE]
-            tasks.append(self._embed_batch_async(batch, task_type, semaphore))
+        offsets = range(0, len(texts), EMBEDDING_BATCH_SIZE)
+        tasks = [
+            self._embed_batch_async(texts[i : i + EMBEDDING_BATCH_SIZE], task_type, semaphore)
+            for i in offsets
+        ]
 
         # Run all batches concurrently (semaphore limits actual concurrency)
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        # Flatten results, handling any exceptions
-        all_embeddings: list[list[float]] = []
-        for result in results:
+        # Copy each batch into its rows, handling any exceptions
+        for start, result in zip(offsets, results):
             if isinstance(result, BaseException):
                 raise result
-            # result is list[list[float]] here
-            all_embeddings.extend(result)  # type: ignore[arg-type]
-
-        return all_embeddings
-
-    async def index_file_async(
-        self,
-        path: Path,
-        semaphore: asyncio.Semaphore,
-    ) -> str | None:
-        """
-        Index a single file asynchronously.
-
-        Removes existing chunks and metadata first to handle partial failures.
+            out[start : start + len(result)] = result
 
-        Args:
-            path: Path to the file to index.
-            semaphore: Semaphore for concurrency control.
-
-        Returns:
-            Relative path if indexed, None if skipped.
-        """
-        try:
-            rel_path = str(path.relative_to(self.root))
-        except ValueError:
-            return None
-
-        # Skip unchanged files
-        if not self._file_needs_reindex(path):
-            return None
-
-        # Delete old chunks AND metadata first (ensures clean state on failure)
-        self._remove_file_from_index(rel_path)
-
-        if not self._should_index(path):
-            return None
-
-        chunks = self._chunk_file(path)
-        if not chunks:
-            # Update metadata for empty files
-            self._update_file_metadata(path, 0)
-            return rel_path
-
-        # Embed asynchronously
-        texts = [c["text"] for c in chunks]
-        embeddings = await self._embed_async(texts, "RETRIEVAL_DOCUMENT", semaphore)
-
-        # Add to collection (sync - chromadb doesn't have async API)
-        self.collection.add(
-            ids=[c["id"] for c in chunks],
-            documents=texts,
-            embeddings=embeddings,
-            metadatas=[c["metadata"] for c in chunks],
-        )
-
-        self._update_file_metadata(path, len(chunks))
-        return rel_path
+        return out
 
     # Type alias for progress callbacks (sync or async)
     ProgressCallback = Union[
@@ -561,37 +992,9 @@ class CodebaseIndex:
             force = True
 
         if force and not dry_run:
-            # Full rebuild: clear everything
-            self.chroma.delete_collection("code")
-            self.collection = self.chroma.create_collection(
-                name="code",
-                metadata={"hnsw:space": "cosine"},
-            )
-            self.chroma.delete_collection("file_metadata")
-            self.meta_collection = self.chroma.create_collection(
-                name="file_metadata",
-            )
-
-        # Collect all indexable files
-        files_to_index: list[Path] = []
-        current_files: set[str] = set()
-        total_chunks = 0
-
-        for path in self.root.rglob("*"):
-            if not path.is_file() or not self._should_index(path):
-                continue
-
-            try:
-                rel_path = str(path.relative_to(self.root))
-            except ValueError:
-                continue
-
-            current_files.add(rel_path)
-
-            # Check if needs reindex
-            if force or self._file_needs_reindex(path):
-                files_to_index.append(path)
+            self._reset_collections()
 
+        files_to_index, current_files = self._collect_files(force)
         skipped = len(current_files) - len(files_to_index)
 
         # Apply max_files limit
@@ -600,9 +1003,7 @@ class CodebaseIndex:
 
         # Dry run: count chunks without API calls
         if dry_run:
-            for path in files_to_index:
-                chunks = self._chunk_file(path)
-                total_chunks += len(chunks)
+            total_chunks = self._count_all_chunks(files_to_index)
             await self._notify_progress(
                 progress_callback,
                 f"Dry run: {len(files_to_index)} files, {total_chunks} chunks",
@@ -622,23 +1023,49 @@ class CodebaseIndex:
 
         # Create semaphore for concurrency control
         semaphore = asyncio.Semaphore(MAX_CONCURRENT_EMBEDS)
-
-        # Index files concurrently
-        tasks = [self.index_file_async(p, semaphore) for p in files_to_index]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Count successes
-        indexed = sum(1 for r in results if r is not None and not isinstance(r, Exception))
-
-        # Log any errors
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
+        loop = asyncio.get_running_loop()
+        groups = [
+            files_to_index[i : i + REBUILD_GROUP_FILES]
+            for i in range(0, total_files, REBUILD_GROUP_FILES)
+        ]
+
+        # Files are processed in groups: one embedding pass (full batches,
+        # concurrent) and one set of chromadb writes per group. The next
+        # group is read and chunked while the current one embeds.
+        indexed = 0
+        done_files = 0
+        next_read = loop.run_in_executor(None, self._chunk_files, groups[0]) if groups else None
+        for i, group in enumerate(groups):
+            chunk_lists = await next_read
+            if i + 1 < len(groups):
+                next_read = loop.run_in_executor(None, self._chunk_files, groups[i + 1])
+            done_files += len(group)
+            try:
+                to_embed, reused, reused_embeddings, stale_ids, counts = self._plan_group(
+                    group, chunk_lists
+                )
+                embeddings = await self._embed_async(
+                    [c["text"] for c in to_embed], "RETRIEVAL_DOCUMENT", semaphore
+                )
+                self._write_group(
+                    to_embed + reused,
+                    np.concatenate([embeddings, reused_embeddings]),
+                    stale_ids,
+                    counts,
+                )
+                indexed += len(group)
+            except Exception as e:
+                logging.warning(f"Failed to index {len(group)} files from {group[0]}: {e}")
                 await self._notify_progress(
                     progress_callback,
-                    f"Error indexing {files_to_index[i]}: {result}",
-                    i + 1,
+                    f"Error indexing {len(group)} files starting at {group[0]}: {e}",
+                    done_files,
                     total_files,
                 )
+                continue
+            await self._notify_progress(
+                progress_callback, f"Indexed {done_files}/{total_files} files", done_files, total_files
+            )
 
         # Remove stale files
         removed = self._remove_stale_files(current_files)
@@ -656,24 +1083,22 @@ class CodebaseIndex:
         """
         Check if the existing index has compatible embedding dimensions.
 
+        Reads the dimension recorded in the collection metadata; indexes
+        created before it was recorded fall back to the length of a stored
+        vector. Neither path needs an API call.
+
         Returns True if compatible or empty, False if dimensions mismatch.
         """
         try:
-            # Try to get one item to check dimensions
-            result = self.collection.get(limit=1, include=["embeddings"])
-            if not result["ids"]:
-                return True  # Empty collection, compatible
+            metadata = self.collection.metadata or {}
+            if "embedding_dim" in metadata:
+                return metadata["embedding_dim"] == EMBEDDING_DIM
 
+            result = self.collection.get(limit=1, include=["embeddings"])
             embeddings = result.get("embeddings")
-            if embeddings and len(embeddings) > 0 and len(embeddings[0]) > 0:
-                # Get a test embedding to compare dimensions
-                test_embed = self._embed(["test"], task_type="RETRIEVAL_DOCUMENT")
-                if test_embed:
-                    existing_dim = len(embeddings[0])
-                    new_dim = len(test_embed[0])
-                    if existing_dim != new_dim:
-                        return False
-            return True
+            if not result["ids"] or embeddings is None or len(embeddings) == 0:
+                return True  # Empty collection, compatible
+            return len(embeddings[0]) == EMBEDDING_DIM
         except Exception:
             return True  # On error, assume compatible
 
@@ -681,8 +1106,13 @@ class CodebaseIndex:
         """
         Index or re-index a single file.
 
-        Removes any existing chunks and metadata before adding new ones.
-        This ensures partial failures leave the file in a re-indexable state.
+        Only chunks whose content hash changed are sent to the embedding API;
+        unchanged chunks are kept and chunks the file no longer produces are
+        deleted. The file's metadata is dropped first, so a failure part way
+        leaves it in a state where _file_needs_reindex returns True.
+
+        Args:
+            path: Path to the file to index.
 
         Returns:
             Number of chunks indexed (0 if skipped).
@@ -692,32 +1122,22 @@ class CodebaseIndex:
         except ValueError:
             return 0
 
-        # Delete old chunks AND metadata first
-        # This ensures failures leave the file in a state where _file_needs_reindex
-        # returns True (missing metadata = needs reindex)
-        self._remove_file_from_index(rel_path)
+        self._remove_file_metadata(rel_path)
 
         if not self._should_index(path):
+            self._remove_file_from_index(rel_path)
             return 0
 
         chunks = self._chunk_file(path)
-        if not chunks:
-            # Still update metadata for empty files so we don't re-check them
-            self._update_file_metadata(path, 0)
-            return 0
+        to_embed, reused, reused_embeddings, stale_ids = self._plan_chunk_update(rel_path, chunks)
 
-        # Batch embed all chunks
-        texts = [c["text"] for c in chunks]
-        embeddings = self._embed(texts, task_type="RETRIEVAL_DOCUMENT")
-
-        self.collection.add(
-            ids=[c["id"] for c in chunks],
-            documents=texts,
-            embeddings=embeddings,
-            metadatas=[c["metadata"] for c in chunks],
+        embeddings = self._embed([c["text"] for c in to_embed], task_type="RETRIEVAL_DOCUMENT")
+        self._store_chunks(
+            to_embed + reused, np.concatenate([embeddings, reused_embeddings]), stale_ids
         )
 
-        # Update metadata for incremental indexing
+        # Update metadata for incremental indexing (also for empty files,
+        # so we don't re-check them)
         self._update_file_metadata(path, len(chunks))
 
         return len(chunks)
@@ -784,36 +1204,9 @@ class CodebaseIndex:
             force = True
 
         if force and not dry_run:
-            # Full rebuild: clear everything
-            self.chroma.delete_collection("code")
-            self.collection = self.chroma.create_collection(
-                name="code",
-                metadata={"hnsw:space": "cosine"},
-            )
-            self.chroma.delete_collection("file_metadata")
-            self.meta_collection = self.chroma.create_collection(
-                name="file_metadata",
-            )
-
-        # Collect all indexable files
-        files_to_index: list[Path] = []
-        current_files: set[str] = set()
-
-        for path in self.root.rglob("*"):
-            if not path.is_file() or not self._should_index(path):
-                continue
-
-            try:
-                rel_path = str(path.relative_to(self.root))
-            except ValueError:
-                continue
-
-            current_files.add(rel_path)
-
-            # Check if needs reindex
-            if force or self._file_needs_reindex(path):
-                files_to_index.append(path)
+            self._reset_collections()
 
+        files_to_index, current_files = self._collect_files(force)
         skipped = len(current_files) - len(files_to_index)
 
         # Apply max_files limit
@@ -822,10 +1215,7 @@ class CodebaseIndex:
 
         # Dry run mode
         if dry_run:
-            total_chunks = 0
-            for path in files_to_index:
-                chunks = self._chunk_file(path)
-                total_chunks += len(chunks)
+            total_chunks = self._count_all_chunks(files_to_index)
             if progress_callback:
                 progress_callback(
                     f"Dry run: {len(files_to_index)} files, {total_chunks} chunks"
@@ -839,22 +1229,27 @@ class CodebaseIndex:
             }
 
         indexed = 0
-        for path in files_to_index:
-            try:
-                rel_path = str(path.relative_to(self.root))
-            except ValueError:
-                continue
-
+        for i in range(0, len(files_to_index), REBUILD_GROUP_FILES):
+            group = files_to_index[i : i + REBUILD_GROUP_FILES]
             if progress_callback:
-                progress_callback(f"Indexing {rel_path}...")
+                progress_callback(f"Indexing files {i + 1}-{i + len(group)} of {len(files_to_index)}...")
 
             try:
-                self.index_file(path)
-                indexed += 1
+                to_embed, reused, reused_embeddings, stale_ids, counts = self._plan_group(
+                    group, self._chunk_files(group)
+                )
+                embeddings = self._embed([c["text"] for c in to_embed], task_type="RETRIEVAL_DOCUMENT")
+                self._write_group(
+                    to_embed + reused,
+                    np.concatenate([embeddings, reused_embeddings]),
+                    stale_ids,
+                    counts,
+                )
+                indexed += len(group)
             except Exception as e:
-                logging.warning(f"Failed to index {rel_path}: {e}")
+                logging.warning(f"Failed to index {len(group)} files from {group[0]}: {e}")
                 if progress_callback:
-                    progress_callback(f"Error indexing {rel_path}: {e}")
+                    progress_callback(f"Error indexing {len(group)} files starting at {group[0]}: {e}")
 
         # Remove stale files (not in dry run)
         removed = self._remove_stale_files(current_files)
@@ -864,6 +1259,165 @@ class CodebaseIndex:
 
         return {"indexed": indexed, "skipped": skipped, "removed": removed}
 
+    def rebuild_batch(
+        self,
+        force: bool = False,
+        progress_callback: Callable[[str], None] | None = None,
+    ) -> dict:
+        """
+        Rebuild the index through the Gemini Batch API.
+
+        Embeds every new or changed chunk (as planned by _plan_chunk_update)
+        in a single asynchronous batch job instead of live embed_content
+        calls. A file's old entries are replaced only once the job has
+        returned all of its vectors, so a failed job leaves the index as it
+        was. Batch requests are billed at half price and have separate,
+        much higher rate limits, but jobs can take minutes to hours — use
+        this for large, latency-tolerant rebuilds.
+
+        Blocks while polling the job with exponential backoff.
+
+        Args:
+            force: If True, clear everything and rebuild from scratch.
+            progress_callback: Optional callback for progress updates.
+
+        Returns:
+            Dict with counts: {"indexed": N, "skipped": M, "removed": K, "chunks": C}
+
+        Raises:
+            RuntimeError: If the batch job does not succeed.
+        """
+        if not force and not self._check_embedding_dimensions():
+            if progress_callback:
+                progress_callback("Embedding model changed, forcing full rebuild...")
+            force = True
+
+        if force:
+            self._reset_collections()
+
+        files_to_index, current_files = self._collect_files(force)
+        skipped = len(current_files) - len(files_to_index)
+
+        # Plan every file against what the index holds; nothing is deleted
+        # until the batch job has returned the vectors that replace it
+        plans = []
+        for path, chunks in zip(files_to_index, self._chunk_files(files_to_index)):
+            rel_path = str(path.relative_to(self.root))
+            plans.append((path, chunks, *self._plan_chunk_update(rel_path, chunks)))
+
+        # Only new or changed chunk text goes to the (billed) batch job
+        all_to_embed = [c for plan in plans for c in plan[2]]
+        embeddings: dict[str, np.ndarray] = {}
+        if all_to_embed:
+            embeddings = self._run_embedding_batch(all_to_embed, progress_callback)
+
+        write_chunks: list[dict] = []
+        write_vectors = [np.empty((0, EMBEDDING_DIM), dtype=np.float32)]
+        stale_ids: list[str] = []
+        counts: list[tuple[Path, int]] = []
+        for path, chunks, to_embed, reused, reused_embeddings, file_stale in plans:
+            # Only replace files whose chunks all came back; the rest keep
+            # their old entries, and their changed mtime/size marks them
+            # for the next rebuild
+            if not all(c["id"] in embeddings for c in to_embed):
+                logging.warning(f"Batch job returned no embeddings for part of {path}")
+                continue
+            write_chunks.extend(to_embed)
+            write_chunks.extend(reused)
+            if to_embed:
+                write_vectors.append(np.stack([embeddings[c["id"]] for c in to_embed]))
+            write_vectors.append(reused_embeddings)
+            stale_ids.extend(file_stale)
+            counts.append((path, len(chunks)))
+
+        self._write_group(write_chunks, np.concatenate(write_vectors), stale_ids, counts)
+        indexed = len(counts)
+        removed = self._remove_stale_files(current_files)
+
+        if progress_callback:
+            progress_callback(f"Done: {indexed} indexed, {skipped} skipped, {removed} removed")
+
+        return {
+            "indexed": indexed,
+            "skipped": skipped,
+            "removed": removed,
+            "chunks": len(write_chunks),
+        }
+
+    def _run_embedding_batch(
+        self,
+        chunks: list[dict],
+        progress_callback: Callable[[str], None] | None = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        Submit chunks as a Batch API embedding job and wait for the results.
+
+        Returns:
+            Mapping of chunk id to embedding vector. Chunks the job failed on
+            are absent from the mapping.
+        """
+        # orjson: these request/result files carry every chunk's text and
+        # vector, so encoding and parsing them dominates the local work
+        with tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False) as f:
+            for c in chunks:
+                line = {
+                    "key": c["id"],
+                    "request": {
+                        "content": {"parts": [{"text": c["text"]}]},
+                        "task_type": "RETRIEVAL_DOCUMENT",
+                        "output_dimensionality": EMBEDDING_DIM,
+                    },
+                }
+                f.write(orjson.dumps(line) + b"\n")
+            requests_path = f.name
+
+        try:
+            uploaded = self.client.files.upload(
+                file=requests_path,
+                config=types.UploadFileConfig(
+                    display_name=f"gpal-index-{self._path_hash()}",
+                    mime_type="jsonl",
+                ),
+            )
+        finally:
+            os.unlink(requests_path)
+
+        job = self.client.batches.create_embeddings(
+            model=EMBEDDING_MODEL,
+            src={"file_name": uploaded.name},
+        )
+        if progress_callback:
+            progress_callback(f"Submitted batch job {job.name} ({len(chunks)} chunks)")
+
+        delay = BATCH_POLL_INITIAL
+        while job.state.name not in _BATCH_DONE_STATES:
+            time.sleep(delay)
+            delay = min(delay * 2, BATCH_POLL_MAX)
+            job = self.client.batches.get(name=job.name)
+            if progress_callback:
+                progress_callback(f"Batch job {job.name}: {job.state.name}")
+
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            raise RuntimeError(f"Batch embedding job {job.name} ended in {job.state.name}: {job.error}")
+
+        results = self.client.files.download(file=job.dest.file_name)
+        keys: list[str] = []
+        values: list[list[float]] = []
+        for raw in results.splitlines():
+            if not raw.strip():
+                continue
+            item = orjson.loads(raw)
+            embedding = (item.get("response") or {}).get("embedding")
+            if embedding is None:
+                logging.warning(f"Batch embedding failed for {item.get('key')}: {item.get('error')}")
+                continue
+            keys.append(item["key"])
+            values.append(embedding["values"])
+        if not keys:
+            return {}
+        vectors = _normalize_rows(np.asarray(values, dtype=np.float32))
+        return dict(zip(keys, vectors))
+
     def search(self, query: str, limit: int = 5) -> list[dict]:
         """
         Search for code matching a natural language query.
@@ -877,11 +1431,12 @@ class CodebaseIndex:
         """
         # Embed query with RETRIEVAL_QUERY task type
         embeddings = self._embed([query], task_type="RETRIEVAL_QUERY")
-        if not embeddings:
+        if len(embeddings) == 0:
             return []
 
         query_embedding = embeddings[0]
 
+        # The graph search already explores max(HNSW_SEARCH_EF, limit) nodes
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=limit,
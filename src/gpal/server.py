@@ -8,15 +8,22 @@ autonomous codebase exploration capabilities.
 import argparse
 import asyncio
 import datetime
+import fnmatch
 import io
+import itertools
 import json
 import logging
+import mmap
 import os
+import re
+import shutil
+import subprocess
 import sys
 import threading
 import tomllib
 import wave
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Annotated, Any
@@ -24,6 +31,8 @@ from typing import Annotated, Any
 from pydantic import Field
 
 import glob as globlib
+import hashlib
+import orjson
 from cachetools import TTLCache
 from dotenv import load_dotenv
 from fastmcp import Context, FastMCP
@@ -95,6 +104,7 @@ MAX_FILE_SIZE = 10 * 1024 * 1024    # 10 MB - prevents accidental DOS
 MAX_INLINE_MEDIA = 20 * 1024 * 1024  # 20 MB - inline media limit
 MAX_SEARCH_FILES = 1000
 MAX_SEARCH_MATCHES = 20
+RG_TIMEOUT = 30  # seconds for the ripgrep fast path in search_project
 RESPONSE_MAX_TOOL_CALLS = 25
 MAX_SEARCH_RESULTS = 10
 
@@ -220,6 +230,15 @@ GEMINI_RETRY_DECORATOR = retry(
 # Dedicated thread pool for Gemini API calls (avoids starving the default executor)
 _EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="gpal")
 
+# ripgrep binary, looked up once; search_project falls back to Python without it
+_RG_PATH = shutil.which("rg")
+
+# Separate pool for search_project file scans, which run inside AFC callbacks
+# that already occupy _EXECUTOR threads (sharing it could deadlock)
+_SEARCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=min(32, (os.cpu_count() or 1) * 4), thread_name_prefix="gpal-search"
+)
+
 # Thread-local flag: True while inside Gemini's automatic function calling loop
 _afc_local = threading.local()
 
@@ -482,25 +501,52 @@ def _load_config() -> dict:
     """Load config from $XDG_CONFIG_HOME/gpal/config.toml (or ~/.config/gpal/config.toml).
 
     Returns parsed dict, or empty dict if file doesn't exist.
-    Logs a warning on parse errors (non-fatal).
+    Logs a warning on read or parse errors (non-fatal).
     """
     config_home = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
     config_path = Path(config_home) / "gpal" / "config.toml"
 
-    if not config_path.is_file():
-        logger.debug("No config file at %s", config_path)
-        return {}
-
     try:
         with open(config_path, "rb") as f:
             config = tomllib.load(f)
         logger.info("Loaded config from %s", config_path)
         return config
+    except FileNotFoundError:
+        logger.debug("No config file at %s", config_path)
+        return {}
+    except (OSError, UnicodeDecodeError) as e:
+        logger.warning("Error reading %s: %s", config_path, e)
+        return {}
     except tomllib.TOMLDecodeError as e:
         logger.warning("Invalid TOML in %s: %s", config_path, e)
         return {}
 
 
+def _expand_path(path_str: str) -> Path:
+    """Expand ~ and $VARS in a user-supplied prompt path.
+
+    Deliberately not memoized: HOME and the environment can change between
+    calls (tests monkeypatch them), and both expansions already return
+    early when there is no leading ~ or no $.
+    """
+    return Path(os.path.expandvars(os.path.expanduser(path_str)))
+
+
+def _read_prompt_file(path: Path, label: str = "system prompt") -> str | None:
+    """Read a prompt file as stripped UTF-8 text, or warn and return None.
+
+    One open+read with no exists/is_file pre-check; a missing, unreadable
+    or non-UTF-8 file is reported through the exception instead.
+    """
+    try:
+        return path.read_bytes().decode("utf-8").strip()
+    except FileNotFoundError:
+        logger.warning("%s file not found: %s", label, path)
+    except (OSError, UnicodeDecodeError) as e:
+        logger.warning("Error reading %s %s: %s", label, path, e)
+    return None
+
+
 def _build_system_instruction(
     config: dict,
     cli_prompt_files: list[str] | None = None,
@@ -529,13 +575,11 @@ def _build_system_instruction(
         logger.warning("Config 'system_prompts' must be a list, got %s", type(config_prompts).__name__)
         config_prompts = []
     for path_str in config_prompts:
-        expanded = Path(os.path.expandvars(os.path.expanduser(path_str)))
-        try:
-            content = expanded.read_text(encoding="utf-8")
-            parts.append(content.strip())
+        expanded = _expand_path(path_str)
+        content = _read_prompt_file(expanded)
+        if content is not None:
+            parts.append(content)
             sources.append(str(expanded))
-        except (OSError, UnicodeDecodeError) as e:
-            logger.warning("Error reading system prompt %s: %s", expanded, e)
 
     # 3. Inline system_prompt from config.toml
     inline = config.get("system_prompt")
@@ -545,15 +589,11 @@ def _build_system_instruction(
 
     # 4. CLI --system-prompt files
     for path_str in cli_prompt_files or []:
-        expanded = Path(os.path.expandvars(os.path.expanduser(path_str)))
-        try:
-            content = expanded.read_text(encoding="utf-8")
-            parts.append(content.strip())
+        expanded = _expand_path(path_str)
+        content = _read_prompt_file(expanded, "CLI system prompt")
+        if content is not None:
+            parts.append(content)
             sources.append(f"--system-prompt {expanded}")
-        except FileNotFoundError:
-            logger.warning("CLI system prompt file not found: %s", expanded)
-        except OSError as e:
-            logger.warning("Error reading CLI system prompt %s: %s", expanded, e)
 
     return "\n\n".join(parts), sources
 
@@ -610,8 +650,142 @@ async def _gpal_lifespan(app):
         logger.info("stdin watchdog stopped")
 
 
+SESSION_TTL = 3600  # Seconds before an idle session leaves memory
+MAX_SESSIONS = 100  # Sessions kept in memory; older ones spill to disk
+SESSION_SPILL_MAX_AGE = 7 * 24 * 3600  # Seconds a spilled history is kept on disk
+SESSION_SPILL_MAX_FILES = 200  # Newest spilled histories kept on disk
+
+# One worker: spill writes, pruning, and restores run in submission order,
+# so a restore queued after a spill always sees the written file
+_SESSION_IO = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gpal-session")
+# In-flight restores by session ID, guarded by sessions_lock
+_session_restores: dict[str, Future] = {}
+
+
+def _sessions_dir() -> Path:
+    """XDG data directory holding histories of evicted sessions."""
+    xdg_data = os.environ.get("XDG_DATA_HOME")
+    base = Path(xdg_data) if xdg_data else Path.home() / ".local" / "share"
+    return base / "gpal" / "sessions"
+
+
+def _session_file(session_id: str) -> Path:
+    """Path of a session's spilled history (session IDs aren't safe filenames)."""
+    digest = hashlib.sha256(session_id.encode()).hexdigest()[:32]
+    return _sessions_dir() / f"{digest}.json"
+
+
+def _prune_spilled_sessions(directory: Path) -> None:
+    """Delete spilled histories past SESSION_SPILL_MAX_AGE, then all but the newest SESSION_SPILL_MAX_FILES.
+
+    MCP session IDs are per-connection, so most spilled files are never
+    read back; without pruning they (and the file contents they quote)
+    would accumulate forever. Leftover .tmp files from interrupted writes
+    count against both limits too.
+    """
+    try:
+        with os.scandir(directory) as it:
+            files = [
+                (e.stat().st_mtime, e.path) for e in it if e.name.endswith((".json", ".tmp"))
+            ]
+    except OSError:
+        return
+    files.sort(reverse=True)
+    cutoff = time.time() - SESSION_SPILL_MAX_AGE
+    for i, (mtime, file_path) in enumerate(files):
+        if i >= SESSION_SPILL_MAX_FILES or mtime < cutoff:
+            try:
+                os.unlink(file_path)
+            except OSError:
+                pass
+
+
+def _persist_session(session_id: str, model: str | None, history: list[Any]) -> None:
+    """Write an evicted session's curated history to disk as JSON (on _SESSION_IO).
+
+    The directory is created 0o700 and the file 0o600: histories include
+    the contents of files attached to the conversation.
+    """
+    try:
+        path = _session_file(session_id)
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        data = {
+            "session_id": session_id,
+            "model": model,
+            "history": [c.model_dump(mode="json", exclude_none=True) for c in history],
+        }
+        tmp = path.with_suffix(".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "wb") as f:
+            f.write(orjson.dumps(data))
+        tmp.replace(path)
+    except Exception as e:
+        logger.warning("Could not persist session %s: %s", session_id, e)
+        return
+    _prune_spilled_sessions(path.parent)
+
+
+def _spill_session(session_id: str, session: Any) -> None:
+    """Queue an evicted session for _persist_session.
+
+    Called from the cache under sessions_lock, so it only snapshots the
+    history list; serializing and writing happen on _SESSION_IO, off the
+    lock and the event loop.
+    """
+    history = list(getattr(session, "_curated_history", getattr(session, "history", [])) or [])
+    if history:
+        _SESSION_IO.submit(_persist_session, session_id, getattr(session, "_gpal_model", None), history)
+
+
+def _load_persisted_history(session_id: str) -> list[types.Content] | None:
+    """Read and remove a spilled session history, or None if there isn't one.
+
+    Run it on _SESSION_IO so it is ordered after any pending spill.
+    """
+    path = _session_file(session_id)
+    try:
+        data = orjson.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load persisted session %s: %s", session_id, e)
+        return None
+    finally:
+        path.unlink(missing_ok=True)
+    if data.get("session_id") != session_id:
+        return None
+    try:
+        history = [types.Content.model_validate(c) for c in data.get("history", [])]
+    except Exception as e:
+        logger.warning("Could not restore persisted session %s: %s", session_id, e)
+        return None
+    # Gemini API requires history to end with a model response
+    if history and history[-1].role == "user":
+        history.pop()
+    return history
+
+
+class _SessionCache(TTLCache):
+    """TTLCache that spills evicted sessions to disk instead of dropping them.
+
+    Both LRU eviction (popitem) and TTL expiry (expire) hand the session to
+    _spill_session; get_session rehydrates it on the next lookup miss.
+    """
+
+    def popitem(self):
+        key, (session, lock) = super().popitem()
+        _spill_session(key, session)
+        return key, (session, lock)
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for key, (session, _) in expired:
+            _spill_session(key, session)
+        return expired
+
+
 mcp = FastMCP("gpal", lifespan=_gpal_lifespan)
-sessions: TTLCache = TTLCache(maxsize=100, ttl=3600)  # Stores (session, lock)
+sessions: TTLCache = _SessionCache(maxsize=MAX_SESSIONS, ttl=SESSION_TTL)  # Stores (session, lock)
 sessions_lock = threading.Lock()
 # Note: session_locks dict is removed; locks are now bundled with sessions.
 uploaded_files: TTLCache = TTLCache(maxsize=200, ttl=3600)  # 1 hour TTL
@@ -651,8 +825,8 @@ def get_server_info() -> str:
             "max_search_files": MAX_SEARCH_FILES,
             "max_search_matches": MAX_SEARCH_MATCHES,
             "max_tool_calls": RESPONSE_MAX_TOOL_CALLS,
-            "session_ttl_seconds": 3600,
-            "max_sessions": 100,
+            "session_ttl_seconds": SESSION_TTL,
+            "max_sessions": MAX_SESSIONS,
         },
         "system_instruction": {
             "roles": ["explorer", "thinker", "analyst", "agent"],
@@ -872,18 +1046,45 @@ def list_directory(path: str = ".") -> list[str] | str:
         return err
 
     try:
-        p = Path(path).resolve()
-        if not p.exists():
-            msg = f"Error: Path '{path}' does not exist"
-            logging.warning(msg)
-            return msg
-        return [item.name for item in p.iterdir()]
+        # One scandir pass; a missing path surfaces as FileNotFoundError
+        # instead of a separate exists() stat
+        with os.scandir(Path(path).resolve()) as it:
+            return sorted(entry.name for entry in it)
+    except FileNotFoundError:
+        msg = f"Error: Path '{path}' does not exist"
+        logging.warning(msg)
+        return msg
     except Exception as e:
         msg = f"Error listing directory: {e}"
         logging.error(msg)
         return msg
 
 
+def _read_text_capped(path: str) -> str | None:
+    """Read a file as UTF-8 text with universal newlines; None if over MAX_FILE_SIZE.
+
+    One open, sized by fstat on the fd (no exists()/stat() path lookups).
+    Reads to EOF, so a file that grew after the fstat is read whole, but
+    never more than one byte past the cap. Undecodable bytes are replaced,
+    and \r\n / lone \r become \n as read_text() gave. OSError propagates.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > MAX_FILE_SIZE:
+            return None
+        # One byte past the stat'ed size notices a file that grew since;
+        # the rest is read only up to one byte past the cap
+        data = f.read(size + 1)
+        if len(data) > size:
+            data += f.read(MAX_FILE_SIZE + 1 - len(data))
+    if len(data) > MAX_FILE_SIZE:
+        return None
+    text = data.decode("utf-8", errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
 def read_file(path: str) -> str:
     """Read the content of a file (up to MAX_FILE_SIZE bytes)."""
     err = _validate_input_path(path)
@@ -891,15 +1092,132 @@ def read_file(path: str) -> str:
         return err
 
     try:
-        p = Path(path).resolve()
-        if not p.exists():
-            return f"Error: File '{path}' does not exist."
-
-        if p.stat().st_size > MAX_FILE_SIZE:
-            return f"Error: File '{path}' exceeds {MAX_FILE_SIZE // (1024*1024)}MB limit."
-        return p.read_text(encoding="utf-8", errors="replace")
+        text = _read_text_capped(path)
+    except FileNotFoundError:
+        return f"Error: File '{path}' does not exist."
     except Exception as e:
         return f"Error reading file '{path}': {e}"
+    if text is None:
+        return f"Error: File '{path}' exceeds {MAX_FILE_SIZE // (1024*1024)}MB limit."
+    return text
+
+
+def _file_contains(filepath: str, needle: bytes) -> bool:
+    """Check whether a file's raw bytes contain needle, via mmap (no decode/copy)."""
+    try:
+        with open(filepath, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return not needle  # mmap can't map empty files
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return m.find(needle) != -1
+    except (OSError, ValueError):
+        return False
+
+
+def _rg_glob_args(glob_pattern: str) -> list[str] | None:
+    """Translate a search_project glob into ripgrep arguments.
+
+    Only globs whose meaning is identical in both are translated: "**/*"
+    (everything) and "**/<name-glob>" such as "**/*.py", which rg's
+    slash-free --glob also matches by basename at any depth. Anything
+    else (anchored paths, explicit dotfiles) returns None and is left
+    to the Python scan.
+    """
+    if glob_pattern == "**/*":
+        return []
+    name_glob = glob_pattern.removeprefix("**/")
+    if name_glob == glob_pattern or not name_glob or "/" in name_glob or "\\" in name_glob:
+        return None
+    if name_glob.startswith((".", "!")) or any(t in name_glob for t in ("**", "{", "}", "[^")):
+        return None  # dotfiles, rg-only syntax (negation, braces, [^])
+    return ["--glob", name_glob]
+
+
+def _walk_name_glob(name_glob: str, root: Path) -> Iterator[str]:
+    """Yield files under root matching "**/<name_glob>", in iglob's order.
+
+    A scandir walk for the glob shapes _rg_glob_args accepts, used when rg
+    is unavailable. Hidden entries are skipped as glob's wildcards skip
+    them, so hidden directories are never entered, and entry types come
+    from the directory listing instead of a resolve() and stat per file.
+    Symlinks are skipped, files and directories alike, as rg skips them
+    without --follow, so both search paths see the same files.
+
+    Yields paths relative to root, joined with os.sep like iglob's.
+    """
+    match = re.compile(fnmatch.translate(os.path.normcase(name_glob))).match
+    stack = [""]
+    while stack:
+        prefix = stack.pop()
+        try:
+            with os.scandir(prefix or root) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if name.startswith("."):
+                continue
+            rel = prefix + name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(rel + os.sep)
+                    continue
+                if not match(os.path.normcase(name)) or not entry.is_file(follow_symlinks=False):
+                    continue
+            except OSError:
+                continue
+            yield rel
+        # Pre-order, first subdirectory first, as glob's "**" recursion
+        stack.extend(reversed(subdirs))
+
+
+def _search_with_rg(search_term: str, glob_pattern: str = "**/*") -> list[str] | None:
+    """List files under cwd containing search_term, using ripgrep.
+
+    Flags mirror the Python scan of glob_pattern: fixed-string match,
+    binary files searched as text, hidden files and symlinks skipped,
+    .gitignore not applied.
+
+    Returns sorted relative paths, or None if rg is unavailable, the glob
+    has no exact rg equivalent, or rg fails (the caller then falls back
+    to the Python scan).
+    """
+    if _RG_PATH is None:
+        return None
+    glob_args = _rg_glob_args(glob_pattern)
+    if glob_args is None:
+        return None
+    try:
+        result = subprocess.run(
+            [
+                _RG_PATH, "--files-with-matches", "--fixed-strings", "--text",
+                "--no-ignore", "--no-messages", *glob_args,
+                "-e", search_term, "--", ".",
+            ],
+            capture_output=True,
+            text=True,
+            errors="replace",
+            stdin=subprocess.DEVNULL,
+            timeout=RG_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    # 0 = matches, 1 = none, 2 = error (possibly with partial results)
+    if result.returncode not in (0, 1) and not result.stdout:
+        return None
+    return sorted(line.removeprefix("./") for line in result.stdout.splitlines() if line)
+
+
+def _format_search_matches(found: list[str]) -> str:
+    """Format sorted matching paths, keeping the first MAX_SEARCH_MATCHES."""
+    if not found:
+        return "No matches found."
+    matches = [f"Match in: {f}" for f in found[:MAX_SEARCH_MATCHES]]
+    if len(found) > MAX_SEARCH_MATCHES:
+        matches.append("... (truncated)")
+    return "\n".join(matches)
 
 
 def search_project(search_term: str, glob_pattern: str = "**/*") -> str:
@@ -914,37 +1232,48 @@ def search_project(search_term: str, glob_pattern: str = "**/*") -> str:
         return "Error: Glob patterns cannot contain '..'."
 
     try:
-        cwd = Path.cwd().resolve()
+        # Whole-project and "**/<name-glob>" searches go to ripgrep when it's
+        # installed; other globs stay in Python (see _rg_glob_args)
+        found = _search_with_rg(search_term, glob_pattern)
+        if found is not None:
+            return _format_search_matches(found)
 
-        # Use iglob iterator to avoid loading huge file lists into memory
-        matches = []
-        files_checked = 0
-
-        for filepath in globlib.iglob(glob_pattern, recursive=True):
-            path_obj = Path(filepath).resolve()
-
-            # Ensure file is within project root and is a file
-            if not path_obj.is_relative_to(cwd) or not path_obj.is_file():
-                continue
-
-            files_checked += 1
-            if files_checked > MAX_SEARCH_FILES:
-                return (
-                    f"Error: Too many files match '{glob_pattern}' (>{MAX_SEARCH_FILES}). "
-                    "Use a more specific pattern, or try semantic_search for large codebases."
-                )
+        cwd = Path.cwd().resolve()
+        glob_args = _rg_glob_args(glob_pattern)
+        if glob_args is not None:
+            files = _walk_name_glob(glob_args[1] if glob_args else "*", cwd)
+        else:
+            # Ensure each match is a file within the project root
+            files = (
+                f for f in globlib.iglob(glob_pattern, recursive=True)
+                if (p := Path(f).resolve()).is_relative_to(cwd) and p.is_file()
+            )
 
-            try:
-                with open(filepath, encoding="utf-8", errors="replace") as f:
-                    if search_term in f.read():
-                        matches.append(f"Match in: {filepath}")
-                        if len(matches) >= MAX_SEARCH_MATCHES:
-                            matches.append("... (truncated)")
-                            return "\n".join(matches)
-            except OSError:
-                continue
+        # Lazy iterators avoid loading huge file lists into memory;
+        # stop one past the limit so we know whether it was exceeded
+        candidates = list(itertools.islice(files, MAX_SEARCH_FILES + 1))
+        if len(candidates) > MAX_SEARCH_FILES:
+            return (
+                f"Error: Too many files match '{glob_pattern}' (>{MAX_SEARCH_FILES}). "
+                "Use a more specific pattern, or try semantic_search for large codebases."
+            )
 
-        return "\n".join(matches) if matches else "No matches found."
+        # Scan files in parallel, but in sorted path order like rg's results,
+        # stopping one match past the cap so truncation is reported alike
+        candidates.sort()
+        needle = search_term.encode("utf-8")
+        futures = [_SEARCH_EXECUTOR.submit(_file_contains, f, needle) for f in candidates]
+        found = []
+        try:
+            for filepath, future in zip(candidates, futures):
+                if future.result():
+                    found.append(filepath)
+                    if len(found) > MAX_SEARCH_MATCHES:
+                        break
+        finally:
+            for future in futures:
+                future.cancel()
+        return _format_search_matches(found)
 
     except Exception as e:
         return f"Error searching project: {e}"
@@ -995,15 +1324,28 @@ def _load_api_key() -> str | None:
     return None
 
 
+# Shared Gemini client, reused so its HTTP connection pool survives across
+# tool calls; rebuilt when the API key changes. A replaced client lives on
+# only while chats created from it do (see create_chat)
+_client: genai.Client | None = None
+_client_key: str | None = None
+_client_lock = threading.Lock()
+
+
 def get_client() -> genai.Client:
-    """Create a Gemini API client from environment or key file."""
+    """Return the shared Gemini API client (key from environment or key file)."""
+    global _client, _client_key
     api_key = _load_api_key()
     if not api_key:
         raise ValueError(
             "Gemini API key not found. Set GEMINI_API_KEY environment variable "
             f"or create {DEFAULT_KEY_FILES[0]}"
         )
-    return genai.Client(api_key=api_key)
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            _client = genai.Client(api_key=api_key)
+            _client_key = api_key
+        return _client
 
 
 def get_index(root: str = "."):
@@ -1043,11 +1385,15 @@ def create_chat(
             system_instruction=_compose_instruction(_SYSTEM_AGENT),
         )
 
-    return client.chats.create(
+    chat = client.chats.create(
         model=model_name,
         history=history or [],
         config=config,
     )
+    # The chat only references the client's internals, and genai.Client.__del__
+    # closes the HTTP transport; pin the client for as long as the chat lives
+    chat._gpal_client = client
+    return chat
 
 async def get_session(
     ctx: Context,
@@ -1060,15 +1406,41 @@ async def get_session(
     target_model = MODEL_ALIASES.get(model_alias.lower(), model_alias)
 
     with sessions_lock:
-        if session_id in sessions:
-            session, lock = sessions[session_id]
-        else:
-            session = create_chat(client, target_model, config=config)
-            session._gpal_model = target_model
-            lock = asyncio.Lock()
-            sessions[session_id] = (session, lock)
-            ctx.set_state("model", target_model)
-            return session, lock
+        item = sessions.get(session_id)
+        if item is None:
+            # Concurrent first calls share one restore, so none of them can
+            # create an empty session while the history is still loading
+            restore = _session_restores.get(session_id)
+            if restore is None:
+                # Spill any expired sessions first so this one's history is queued
+                sessions.expire()
+                # Queued behind that spill on _SESSION_IO; the file I/O stays off the loop
+                restore = _SESSION_IO.submit(_load_persisted_history, session_id)
+                _session_restores[session_id] = restore
+
+    if item is None:
+        # Shielded: one cancelled caller must not cancel the shared restore
+        try:
+            history = await asyncio.shield(asyncio.wrap_future(restore))
+        except BaseException:
+            with sessions_lock:
+                if _session_restores.get(session_id) is restore:
+                    del _session_restores[session_id]
+            raise
+        with sessions_lock:
+            if _session_restores.get(session_id) is restore:
+                del _session_restores[session_id]
+            item = sessions.get(session_id)  # a caller sharing the restore may have won
+            if item is None:
+                if history:
+                    logging.info(f"Restoring session '{session_id}' ({len(history)} turns) from disk")
+                session = create_chat(client, target_model, history=history, config=config)
+                session._gpal_model = target_model
+                lock = asyncio.Lock()
+                sessions[session_id] = (session, lock)
+                ctx.set_state("model", target_model)
+                return session, lock
+    session, lock = item
 
     # Use per-session lock for migration
     async with lock:
@@ -1193,6 +1565,136 @@ def _gemini_code_exec(
     return "Code executed (no output)."
 
 
+def _read_text_part(path: str) -> types.Part | str:
+    """Read a text file as an inline context part, or return an error string."""
+    try:
+        text = _read_text_capped(path)
+    except Exception as e:
+        return f"Error reading file '{path}': {e}"
+    if text is None:
+        return f"Error: '{path}' exceeds {MAX_FILE_SIZE // (1024*1024)}MB limit."
+    return types.Part.from_text(text=f"--- START FILE: {path} ---\n{text}\n--- END FILE: {path} ---\n")
+
+
+def _read_media_part(path: str) -> types.Part | str:
+    """Read an image/PDF as an inline bytes part, or return an error string."""
+    try:
+        p = Path(path)
+        if p.stat().st_size > MAX_INLINE_MEDIA:
+            return f"Error: '{path}' exceeds {MAX_INLINE_MEDIA // (1024*1024)}MB inline limit."
+        mime_type = detect_mime_type(path)
+        if not mime_type:
+            return f"Error: Unknown media type for '{path}'."
+        data = p.read_bytes()
+    except Exception as e:
+        return f"Error reading media '{path}': {e}"
+    return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+
+async def _load_context_parts(
+    file_paths: list[str] | None,
+    media_paths: list[str] | None,
+) -> list[types.Part] | str:
+    """Validate and read file_paths/media_paths for a consult call.
+
+    All files are read concurrently on _EXECUTOR (one hop per file rather
+    than sequential stat + read round-trips), so several attachments cost
+    about as much as the slowest one.
+
+    Returns the parts in argument order (text files first), or the first
+    error message.
+    """
+    for path in [*(file_paths or []), *(media_paths or [])]:
+        err = _validate_input_path(path)
+        if err:
+            return err
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(_EXECUTOR, _read_text_part, p) for p in file_paths or []),
+        *(loop.run_in_executor(_EXECUTOR, _read_media_part, p) for p in media_paths or []),
+    )
+    for result in results:
+        if isinstance(result, str):
+            return result
+    return list(results)
+
+
+def _uri_part(client: genai.Client, uri: str) -> types.Part:
+    """Build a Part for a Gemini File API URI, resolving its MIME type."""
+    mime = None
+    # Check local cache first (populated by upload_file)
+    with uploaded_files_lock:
+        cached = uploaded_files.get(uri)
+    if cached and cached.mime_type:
+        mime = cached.mime_type
+    else:
+        # Try the Files API for URIs not in our cache
+        try:
+            file_id = uri.rstrip("/").rsplit("/", 1)[-1]
+            file_meta = client.files.get(name=f"files/{file_id}")
+            mime = file_meta.mime_type
+        except Exception:
+            pass
+    return types.Part.from_uri(file_uri=uri, mime_type=mime)
+
+
+async def _load_uri_parts(client: genai.Client, file_uris: list[str] | None) -> list[types.Part]:
+    """Resolve file_uris to Parts concurrently, keeping argument order.
+
+    Uncached URIs need a Files API lookup, so these run on _EXECUTOR
+    rather than blocking the event loop one request at a time.
+    """
+    if not file_uris:
+        return []
+    loop = asyncio.get_running_loop()
+    return list(await asyncio.gather(
+        *(loop.run_in_executor(_EXECUTOR, _uri_part, client, uri) for uri in file_uris)
+    ))
+
+
+def _build_consult_config(
+    role_prompt: str,
+    json_mode: bool,
+    response_schema: str | None,
+    deep_thinking: bool = False,
+    cached_content: str | None = None,
+) -> types.GenerateContentConfig | str:
+    """Build the generation config shared by consult_gemini and oneshot.
+
+    Tools + AFC are always enabled so history with function calls stays
+    valid and synthesis models can fill gaps the explorer missed.
+
+    Returns the config, or an error string for an invalid response_schema.
+    """
+    config_kwargs: dict[str, Any] = {
+        "temperature": 0.2,
+        "tools": [list_directory, read_file, search_project, gemini_search, semantic_search, git],
+        "automatic_function_calling": types.AutomaticFunctionCallingConfig(
+            disable=False,
+            maximum_remote_calls=RESPONSE_MAX_TOOL_CALLS,
+        ),
+        "system_instruction": _compose_instruction(role_prompt),
+        "http_options": _NO_SDK_RETRY,
+    }
+
+    if deep_thinking:
+        config_kwargs["thinking_config"] = types.ThinkingConfig(thinking_level="HIGH")
+
+    if json_mode:
+        config_kwargs["response_mime_type"] = "application/json"
+        if response_schema:
+            try:
+                config_kwargs["response_schema"] = json.loads(response_schema)
+            except json.JSONDecodeError as e:
+                return f"Error: Invalid JSON schema: {e}"
+
+    if cached_content:
+        config_kwargs["cached_content"] = cached_content
+
+    return types.GenerateContentConfig(**config_kwargs)
+
+
 async def _consult(
     query: str,
     ctx: Context,
@@ -1238,8 +1740,6 @@ async def _consult(
             )
 
         # Build generation config
-        # Tools + AFC always enabled so history with function calls stays valid
-        # and synthesis models can fill gaps the explorer missed
         _role_prompts = {
             "explorer": _SYSTEM_EXPLORER,
             "thinker": _SYSTEM_THINKER,
@@ -1247,93 +1747,29 @@ async def _consult(
             "agent": _SYSTEM_AGENT,
         }
         role_prompt = _role_prompts.get(role, _SYSTEM_AGENT)
-        config_kwargs: dict[str, Any] = {
-            "temperature": 0.2,
-            "tools": [list_directory, read_file, search_project, gemini_search, semantic_search, git],
-            "automatic_function_calling": types.AutomaticFunctionCallingConfig(
-                disable=False,
-                maximum_remote_calls=RESPONSE_MAX_TOOL_CALLS,
-            ),
-            "system_instruction": _compose_instruction(role_prompt),
-            "http_options": _NO_SDK_RETRY,
-        }
-
-        # Enable deep thinking for Pro synthesis
-        if role == "thinker":
-            config_kwargs["thinking_config"] = types.ThinkingConfig(thinking_level="HIGH")
-
-        if json_mode:
-            config_kwargs["response_mime_type"] = "application/json"
-            if response_schema:
-                try:
-                    config_kwargs["response_schema"] = json.loads(response_schema)
-                except json.JSONDecodeError as e:
-                    return f"Error: Invalid JSON schema: {e}"
-
-        if cached_content:
-            config_kwargs["cached_content"] = cached_content
-
-        gen_config = types.GenerateContentConfig(**config_kwargs)
+        gen_config = _build_consult_config(
+            role_prompt,
+            json_mode,
+            response_schema,
+            # Enable deep thinking for Pro synthesis
+            deep_thinking=(role == "thinker"),
+            cached_content=cached_content,
+        )
+        if isinstance(gen_config, str):
+            return gen_config
 
         session, lock = await get_session(ctx, client, model_alias, gen_config)
 
-        parts: list[types.Part] = []
         loop = asyncio.get_running_loop()
 
-        # Context: Text files (offloaded to thread pool to avoid blocking event loop)
-        for path in file_paths or []:
-            err = _validate_input_path(path)
-            if err:
-                return err
-            try:
-                p = Path(path)
-                size = await loop.run_in_executor(_EXECUTOR, lambda p=p: p.stat().st_size)
-                if size > MAX_FILE_SIZE:
-                    return f"Error: '{path}' exceeds {MAX_FILE_SIZE // (1024*1024)}MB limit."
-                content = await loop.run_in_executor(
-                    _EXECUTOR, lambda p=p: p.read_text(encoding="utf-8", errors="replace")
-                )
-                parts.append(types.Part.from_text(
-                    text=f"--- START FILE: {path} ---\n{content}\n--- END FILE: {path} ---\n"
-                ))
-            except Exception as e:
-                return f"Error reading file '{path}': {e}"
-
-        # Context: Inline media (offloaded to thread pool)
-        for path in media_paths or []:
-            err = _validate_input_path(path)
-            if err:
-                return err
-            try:
-                p = Path(path)
-                size = await loop.run_in_executor(_EXECUTOR, lambda p=p: p.stat().st_size)
-                if size > MAX_INLINE_MEDIA:
-                    return f"Error: '{path}' exceeds {MAX_INLINE_MEDIA // (1024*1024)}MB inline limit."
-                mime_type = detect_mime_type(path)
-                if not mime_type:
-                    return f"Error: Unknown media type for '{path}'."
-                data = await loop.run_in_executor(_EXECUTOR, lambda p=p: p.read_bytes())
-                parts.append(types.Part.from_bytes(data=data, mime_type=mime_type))
-            except Exception as e:
-                return f"Error reading media '{path}': {e}"
+        # Context: Text files and inline media (read concurrently off the event loop)
+        loaded = await _load_context_parts(file_paths, media_paths)
+        if isinstance(loaded, str):
+            return loaded
+        parts: list[types.Part] = loaded
 
         # Context: File URIs (from upload_file or Gemini Files API)
-        for uri in file_uris or []:
-            mime = None
-            # Check local cache first (populated by upload_file)
-            with uploaded_files_lock:
-                cached = uploaded_files.get(uri)
-            if cached and cached.mime_type:
-                mime = cached.mime_type
-            else:
-                # Try the Files API for URIs not in our cache
-                try:
-                    file_id = uri.rstrip("/").rsplit("/", 1)[-1]
-                    file_meta = client.files.get(name=f"files/{file_id}")
-                    mime = file_meta.mime_type
-                except Exception:
-                    pass
-            parts.append(types.Part.from_uri(file_uri=uri, mime_type=mime))
+        parts.extend(await _load_uri_parts(client, file_uris))
 
         parts.append(types.Part.from_text(text=query))
 
@@ -1369,6 +1805,8 @@ async def _consult(
                         # Sanitize: Gemini API requires history to end with model response
                         if prev_history and getattr(prev_history[-1], "role", "") == "user":
                             prev_history.pop()
+                        # Same shared client: resetting it here would close it
+                        # for every other live session and cascade the resets
                         new_client = get_client()
                         target_model = MODEL_ALIASES.get(model_alias.lower(), model_alias)
                         session = create_chat(new_client, target_model, history=prev_history, config=gen_config)
@@ -1605,80 +2043,19 @@ async def consult_gemini_oneshot(
         loop = asyncio.get_running_loop()
 
         # Build parts
-        parts: list[types.Part] = []
-
-        for path in file_paths or []:
-            err = _validate_input_path(path)
-            if err:
-                return err
-            try:
-                p = Path(path)
-                size = await loop.run_in_executor(_EXECUTOR, lambda p=p: p.stat().st_size)
-                if size > MAX_FILE_SIZE:
-                    return f"Error: '{path}' exceeds {MAX_FILE_SIZE // (1024*1024)}MB limit."
-                content = await loop.run_in_executor(
-                    _EXECUTOR, lambda p=p: p.read_text(encoding="utf-8", errors="replace")
-                )
-                parts.append(types.Part.from_text(
-                    text=f"--- START FILE: {path} ---\n{content}\n--- END FILE: {path} ---\n"
-                ))
-            except Exception as e:
-                return f"Error reading file '{path}': {e}"
+        loaded = await _load_context_parts(file_paths, media_paths)
+        if isinstance(loaded, str):
+            return loaded
+        parts: list[types.Part] = loaded
 
-        for path in media_paths or []:
-            err = _validate_input_path(path)
-            if err:
-                return err
-            try:
-                p = Path(path)
-                size = await loop.run_in_executor(_EXECUTOR, lambda p=p: p.stat().st_size)
-                if size > MAX_INLINE_MEDIA:
-                    return f"Error: '{path}' exceeds {MAX_INLINE_MEDIA // (1024*1024)}MB inline limit."
-                mime_type = detect_mime_type(path)
-                if not mime_type:
-                    return f"Error: Unknown media type for '{path}'."
-                data = await loop.run_in_executor(_EXECUTOR, lambda p=p: p.read_bytes())
-                parts.append(types.Part.from_bytes(data=data, mime_type=mime_type))
-            except Exception as e:
-                return f"Error reading media '{path}': {e}"
-
-        for uri in file_uris or []:
-            mime = None
-            with uploaded_files_lock:
-                cached = uploaded_files.get(uri)
-            if cached and cached.mime_type:
-                mime = cached.mime_type
-            else:
-                try:
-                    file_id = uri.rstrip("/").rsplit("/", 1)[-1]
-                    file_meta = client.files.get(name=f"files/{file_id}")
-                    mime = file_meta.mime_type
-                except Exception:
-                    pass
-            parts.append(types.Part.from_uri(file_uri=uri, mime_type=mime))
+        parts.extend(await _load_uri_parts(client, file_uris))
 
         parts.append(types.Part.from_text(text=query))
 
         # Build config
-        config_kwargs: dict[str, Any] = {
-            "temperature": 0.2,
-            "tools": [list_directory, read_file, search_project, gemini_search, semantic_search, git],
-            "automatic_function_calling": types.AutomaticFunctionCallingConfig(
-                disable=False,
-                maximum_remote_calls=RESPONSE_MAX_TOOL_CALLS,
-            ),
-            "system_instruction": _compose_instruction(_SYSTEM_AGENT),
-            "http_options": _NO_SDK_RETRY,
-        }
-        if json_mode:
-            config_kwargs["response_mime_type"] = "application/json"
-            if response_schema:
-                try:
-                    config_kwargs["response_schema"] = json.loads(response_schema)
-                except json.JSONDecodeError as e:
-                    return f"Error: Invalid JSON schema: {e}"
-
-        gen_config = types.GenerateContentConfig(**config_kwargs)
+        gen_config = _build_consult_config(_SYSTEM_AGENT, json_mode, response_schema)
+        if isinstance(gen_config, str):
+            return gen_config
 
         # Proactive rate limiting with re-check and jitter
         await _async_throttle(resolved_model)
@@ -40,6 +40,14 @@ class TestLoadConfig:
         (config_dir / "config.toml").write_text("this is not valid [[[toml")
         assert _load_config() == {}
 
+    def test_non_utf8_config(self, tmp_path, monkeypatch):
+        """Returns empty dict when the file is not valid UTF-8 (non-fatal)."""
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+        config_dir = tmp_path / "gpal"
+        config_dir.mkdir()
+        (config_dir / "config.toml").write_bytes(b'system_prompt = "\xff\xfe"\n')
+        assert _load_config() == {}
+
     def test_xdg_default(self, tmp_path, monkeypatch):
         """Falls back to ~/.config when XDG_CONFIG_HOME is unset."""
         monkeypatch.delenv("XDG_CONFIG_HOME", raising=False)
@@ -83,6 +91,24 @@ class TestBuildSystemInstruction:
         assert "Custom instruction" in text
         assert DEFAULT_SYSTEM_INSTRUCTION.strip() not in text
 
+    def test_layers_joined_once_with_canonical_spacing(self, tmp_path):
+        """Every layer is stripped and separated by exactly one blank line."""
+        files = []
+        for i in range(40):
+            f = tmp_path / f"p{i}.md"
+            f.write_text(f"\n\n  LAYER_{i}\n\n\n")
+            files.append(str(f))
+        config = {
+            "include_default_prompt": False,
+            "system_prompts": files[:20],
+            "system_prompt": "  INLINE\n",
+        }
+        text, sources = _build_system_instruction(config, cli_prompt_files=files[20:])
+        expected = [f"LAYER_{i}" for i in range(20)] + ["INLINE"]
+        expected += [f"LAYER_{i}" for i in range(20, 40)]
+        assert text == "\n\n".join(expected)
+        assert len(sources) == 41
+
     def test_composition_order(self, tmp_path):
         """Verifies correct ordering: default, config files, inline, CLI files."""
         config_file = tmp_path / "config-prompt.md"
@@ -134,6 +160,13 @@ class TestBuildSystemInstruction:
         # Should fall through to default only
         assert text == DEFAULT_SYSTEM_INSTRUCTION.strip()
 
+    def test_binary_cli_prompt_file(self, tmp_path):
+        """A non-UTF-8 --system-prompt file is skipped like a config one."""
+        binary_file = tmp_path / "binary.md"
+        binary_file.write_bytes(b"\x80\x81\x82\xff\xfe")
+        text, sources = _build_system_instruction({}, cli_prompt_files=[str(binary_file)])
+        assert not any("binary.md" in s for s in sources)
+
     def test_system_prompts_wrong_type(self):
         """String instead of list for system_prompts is handled gracefully."""
         config = {"system_prompts": "not-a-list.md"}
@@ -159,6 +192,16 @@ class TestBuildSystemInstruction:
         text, sources = _build_system_instruction(config)
         assert "Workspace prompt" in text
 
+    def test_expansion_follows_env_changes(self, tmp_path, monkeypatch):
+        """The same ~ path resolves against the current HOME on every call."""
+        for name in ("one", "two"):
+            home = tmp_path / name
+            home.mkdir()
+            (home / "GEMINI.md").write_text(f"home {name}")
+            monkeypatch.setenv("HOME", str(home))
+            text, _ = _build_system_instruction({"system_prompts": ["~/GEMINI.md"]})
+            assert f"home {name}" in text
+
     def test_envvar_expansion_cli(self, tmp_path, monkeypatch):
         """Environment variables work in CLI --system-prompt paths too."""
         monkeypatch.setenv("PROJECT", str(tmp_path))
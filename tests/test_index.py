@@ -4,6 +4,8 @@ import os
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import numpy as np
+import pathspec
 import pytest
 
 from gpal.index import (
@@ -13,11 +15,16 @@ from gpal.index import (
     CHUNK_OVERLAP,
     BINARY_EXTENSIONS,
     EMBEDDING_BATCH_SIZE,
+    EMBEDDING_DIM,
     EMBEDDING_MODEL,
+    HNSW_CONSTRUCTION_EF,
+    HNSW_M,
+    HNSW_SEARCH_EF,
     MAX_CONCURRENT_EMBEDS,
     MAX_FILE_SIZE,
     MAX_RETRIES,
     RATE_LIMIT_DELAY,
+    _chunk_ranges,
 )
 
 
@@ -35,6 +42,15 @@ def test_xdg_path_default():
         assert path == Path.home() / ".local" / "share" / "gpal" / "index"
 
 
+def test_path_hash_is_stable(simple_index, tmp_path):
+    """The index directory name is unchanged, so existing indexes are found."""
+    import hashlib
+
+    expected = hashlib.md5(str(tmp_path.resolve()).encode()).hexdigest()[:12]
+    assert simple_index._path_hash() == expected
+    assert simple_index.db_path.name == expected
+
+
 def test_xdg_path_custom():
     """Verify get_index_path respects XDG_DATA_HOME."""
     with patch.dict(os.environ, {"XDG_DATA_HOME": "/custom/data"}):
@@ -137,6 +153,142 @@ def test_should_index_multipart_extension(index_with_gitignore, tmp_path):
     assert index_with_gitignore._should_index(normal_js) is True
 
 
+@pytest.mark.parametrize(
+    "name, indexed",
+    [
+        ("LOGO.PNG", False),
+        ("Bundle.Min.JS", False),
+        ("admin.js", True),  # ends in "min.js" but not ".min.js"
+        ("png", True),  # bare name equal to an extension sans dot
+        ("archive.tar.gz", False),
+    ],
+)
+def test_should_index_suffix_edge_cases(index_with_gitignore, tmp_path, name, indexed):
+    """Suffix matching is case-insensitive and anchored on the dot."""
+    path = tmp_path / name
+    path.write_text("x")
+    assert index_with_gitignore._should_index(path) is indexed
+
+
+def test_walk_files_prunes_hidden_and_ignored_dirs(index_with_gitignore, tmp_path):
+    """The walker skips hidden/gitignored dirs and applies file filters."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "main.py").write_text("x = 1")
+    (tmp_path / "src" / "bundle.min.js").write_text("x")
+    (tmp_path / "debug.log").write_text("log")
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "node_modules" / "pkg" / "index.js").write_text("x")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("ref")
+
+    walked = {
+        rel: (path, st.st_size) for path, rel, st in index_with_gitignore._walk_files()
+    }
+    assert walked == {"src/main.py": (os.path.join(str(tmp_path), "src", "main.py"), 5)}
+
+
+def test_walk_files_skips_stat_for_rejected_names(index_with_gitignore, tmp_path):
+    """Binary and gitignored files are rejected by name, before any stat."""
+    (tmp_path / "main.py").write_text("x = 1")
+    (tmp_path / "debug.log").write_text("log")
+    (tmp_path / "image.png").write_bytes(b"png")
+    stat_calls = []
+    real_stat = os.DirEntry.stat
+
+    class CountingEntry:
+        def __init__(self, entry):
+            self._entry = entry
+
+        def __getattr__(self, name):
+            return getattr(self._entry, name)
+
+        def stat(self, *args, **kwargs):
+            stat_calls.append(self._entry.name)
+            return real_stat(self._entry, *args, **kwargs)
+
+    real_scandir = os.scandir
+
+    class CountingScandir:
+        def __init__(self, path):
+            self._it = real_scandir(path)
+
+        def __enter__(self):
+            return (CountingEntry(e) for e in self._it.__enter__())
+
+        def __exit__(self, *exc):
+            return self._it.__exit__(*exc)
+
+    with patch("gpal.index.os.scandir", CountingScandir):
+        walked = [rel for _, rel, _ in index_with_gitignore._walk_files()]
+
+    assert walked == ["main.py"]
+    assert stat_calls == ["main.py"]
+
+
+def test_chunk_file_rejects_oversize(simple_index, tmp_path):
+    """A file that grew past MAX_FILE_SIZE after filtering is not read."""
+    f = tmp_path / "grown.py"
+    f.write_text("x = 1\n")
+    with patch("gpal.index.MAX_FILE_SIZE", 2):
+        assert simple_index._chunk_file(f) == []
+
+
+def test_ignore_union_matches_pathspec(index_with_gitignore):
+    """The compiled union regex agrees with pathspec for negation-free specs."""
+    assert index_with_gitignore._ignore_re is not None
+    for rel in ["a.log", "src/a.log", "node_modules/", "src/build/", "main.py", "builder.py"]:
+        expected = index_with_gitignore.ignore_spec.match_file(rel)
+        assert index_with_gitignore._is_ignored(rel) is expected
+
+
+def test_ignore_negation_falls_back_to_pathspec(tmp_path, mock_client):
+    """Specs with ! patterns keep pathspec's last-match-wins semantics."""
+    (tmp_path / ".gitignore").write_text("*.log\n!keep.log\n")
+    with patch("gpal.index.chromadb.PersistentClient"):
+        index = CodebaseIndex(tmp_path, mock_client)
+    assert index._ignore_re is None
+    assert index._is_ignored("debug.log") is True
+    assert index._is_ignored("keep.log") is False
+
+
+def test_gitignore_compiled_once(index_with_gitignore, tmp_path):
+    """Filtering many paths never re-parses .gitignore."""
+    (tmp_path / "main.py").write_text("x")
+    with patch("gpal.index.pathspec.PathSpec.from_lines") as from_lines:
+        for _ in range(50):
+            index_with_gitignore._should_index(tmp_path / "main.py")
+            index_with_gitignore._is_ignored("src/debug.log")
+    from_lines.assert_not_called()
+
+
+def test_gitignore_parse_reused_across_indexes(tmp_path, mock_client):
+    """A second index on the same root reuses the parsed .gitignore until it changes."""
+    gitignore = tmp_path / ".gitignore"
+    gitignore.write_text("*.log\n")
+    with patch("gpal.index.chromadb.PersistentClient"):
+        first = CodebaseIndex(tmp_path, mock_client)
+        with patch(
+            "gpal.index.pathspec.PathSpec.from_lines",
+            wraps=pathspec.PathSpec.from_lines,
+        ) as from_lines:
+            second = CodebaseIndex(tmp_path, mock_client)
+            assert second.ignore_spec is first.ignore_spec
+            from_lines.assert_not_called()
+
+            gitignore.write_text("*.tmp\n")
+            st = gitignore.stat()
+            os.utime(gitignore, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+            third = CodebaseIndex(tmp_path, mock_client)
+            from_lines.assert_called_once()
+    assert third._is_ignored("a.tmp") and not third._is_ignored("a.log")
+
+
+def test_missing_gitignore_ignores_nothing(simple_index):
+    """Without a .gitignore there is no spec and nothing matches."""
+    assert simple_index.ignore_spec is None
+    assert simple_index._is_ignored("debug.log") is False
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # _chunk_file Tests
 # ─────────────────────────────────────────────────────────────────────────────
@@ -188,6 +340,54 @@ def test_chunk_file_large(simple_index, tmp_path):
         assert second_start < first_end  # Overlap exists
 
 
+@pytest.mark.parametrize("n_lines,expected", [
+    (50, [(1, 50)]),
+    (95, [(1, 50), (41, 90), (81, 95)]),
+    (130, [(1, 50), (41, 90), (81, 130)]),
+])
+def test_chunk_file_window_boundaries(simple_index, tmp_path, n_lines, expected):
+    """Windows step by CHUNK_SIZE - CHUNK_OVERLAP with no redundant tail chunk."""
+    f = tmp_path / "f.py"
+    f.write_text("\n".join(f"line {i}" for i in range(1, n_lines + 1)) + "\n")
+
+    chunks = simple_index._chunk_file(f)
+    spans = [(c["metadata"]["start_line"], c["metadata"]["end_line"]) for c in chunks]
+    assert spans == expected
+    for c, (start, end) in zip(chunks, spans):
+        assert c["text"].splitlines() == [f"line {i}" for i in range(start, end + 1)]
+
+
+def test_chunk_ranges_match_chunk_file(simple_index, tmp_path):
+    """_chunk_ranges and _count_chunks agree with what _chunk_file emits."""
+    f = tmp_path / "f.py"
+    for n_lines in range(0, 3 * CHUNK_SIZE):
+        f.write_text("".join(f"{i}\n" for i in range(n_lines)))
+        spans = [
+            (c["metadata"]["start_line"] - 1, c["metadata"]["end_line"])
+            for c in simple_index._chunk_file(f)
+        ]
+        assert _chunk_ranges(n_lines) == spans
+        assert simple_index._count_chunks(f) == len(spans)
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "one line, no newline",
+    "a\n\nb\n\n",
+    "crlf\r\nlines\r\nmixed\rends\n",
+    "".join(f"line {i}\n" for i in range(3 * CHUNK_SIZE + 7)),
+    "h\u00e9llo w\u00f6rld \u2603\n" * (2 * CHUNK_SIZE) + "\u00fcnterminated",
+])
+def test_chunk_file_whole_read_matches_streaming(simple_index, tmp_path, content):
+    """Small files take the one-read path; it must match the streamed chunks."""
+    f = tmp_path / "f.py"
+    f.write_bytes(content.encode())
+    whole = simple_index._chunk_file(f)
+    with patch("gpal.index.WHOLE_READ_MAX", -1):
+        streamed = simple_index._chunk_file(f)
+    assert whole == streamed
+
+
 def test_chunk_file_empty(simple_index, tmp_path):
     """Empty files produce no chunks."""
     empty_file = tmp_path / "empty.py"
@@ -212,6 +412,20 @@ def test_chunk_file_binary_content(simple_index, tmp_path):
     assert "\ufffd" in chunks[0]["text"]  # U+FFFD replacement character
 
 
+@pytest.mark.parametrize("whole_read_max", [10 * 1024 * 1024, -1])
+def test_chunk_file_skips_nul_content(simple_index, tmp_path, whole_read_max):
+    """Files with NUL bytes near the start are binary, whatever the extension."""
+    blob = tmp_path / "data.db"
+    blob.write_bytes(b"SQLite format 3\x00" + b"\x01\x02\n" * 100)
+    late_nul = tmp_path / "notes.txt"
+    late_nul.write_bytes(b"x\n" * 5000 + b"\x00")
+
+    with patch("gpal.index.WHOLE_READ_MAX", whole_read_max):
+        assert simple_index._chunk_file(blob) == []
+        assert simple_index._count_chunks(blob) == 0
+        assert simple_index._chunk_file(late_nul) != []
+
+
 def test_chunk_file_id_format(simple_index, tmp_path):
     """Chunk IDs follow the expected format."""
     test_file = tmp_path / "test.py"
@@ -222,6 +436,19 @@ def test_chunk_file_id_format(simple_index, tmp_path):
     assert chunks[0]["id"] == "test.py:1-1"
 
 
+def test_chunk_files_preserves_order(simple_index, tmp_path):
+    """Parallel chunking returns results in input order."""
+    paths = []
+    for i in range(20):
+        p = tmp_path / f"f{i}.py"
+        p.write_text(f"content {i}")
+        paths.append(p)
+
+    results = simple_index._chunk_files(paths)
+
+    assert [r[0]["metadata"]["file"] for r in results] == [f"f{i}.py" for i in range(20)]
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Constants Tests
 # ─────────────────────────────────────────────────────────────────────────────
@@ -276,6 +503,82 @@ def test_embedding_model():
     assert EMBEDDING_MODEL == "gemini-embedding-001", "Should use newer embedding model"
 
 
+def test_embed_requests_truncated_normalized_vectors(simple_index, mock_client):
+    """Embeddings are requested at EMBEDDING_DIM and come back unit-length."""
+    response = MagicMock()
+    response.embeddings = [MagicMock(values=[3.0, 4.0] + [0.0] * (EMBEDDING_DIM - 2))]
+    mock_client.models.embed_content.return_value = response
+
+    embeddings = simple_index._embed(["text"])
+
+    config = mock_client.models.embed_content.call_args.kwargs["config"]
+    assert config["output_dimensionality"] == EMBEDDING_DIM
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (1, EMBEDDING_DIM)
+    assert embeddings[0, :2] == pytest.approx([0.6, 0.8])
+
+
+def test_embed_fills_out_buffer(simple_index, mock_client):
+    """A caller-supplied buffer is filled in place and returned."""
+    mock_client.models.embed_content.side_effect = (
+        lambda model, contents, config: _fake_embed_response(contents)
+    )
+    out = np.zeros((2, EMBEDDING_DIM), dtype=np.float32)
+
+    result = simple_index._embed(["chunk 0", "chunk 1"], out=out)
+
+    assert result is out
+    assert np.linalg.norm(out, axis=1) == pytest.approx([1.0, 1.0])
+
+
+def test_embed_empty_returns_empty_matrix(simple_index, mock_client):
+    """No texts means no API call and a (0, EMBEDDING_DIM) result."""
+    assert simple_index._embed([]).shape == (0, EMBEDDING_DIM)
+    mock_client.models.embed_content.assert_not_called()
+
+
+def test_check_embedding_dimensions_uses_collection_metadata(simple_index, mock_client):
+    """The recorded dimension decides compatibility without an API call."""
+    simple_index.collection = MagicMock()
+    simple_index.collection.metadata = {"embedding_dim": EMBEDDING_DIM}
+    assert simple_index._check_embedding_dimensions() is True
+
+    simple_index.collection.metadata = {"embedding_dim": 3072}
+    assert simple_index._check_embedding_dimensions() is False
+    mock_client.models.embed_content.assert_not_called()
+
+
+def test_check_embedding_dimensions_legacy_collection(simple_index):
+    """Collections without recorded metadata fall back to a stored vector."""
+    simple_index.collection = MagicMock()
+    simple_index.collection.metadata = {"hnsw:space": "cosine"}
+    simple_index.collection.get.return_value = {"ids": ["a.py:1-1"], "embeddings": [[0.0] * 3072]}
+    assert simple_index._check_embedding_dimensions() is False
+
+
+def test_persistent_client_disables_telemetry(tmp_path, mock_client):
+    """The chroma client is opened with anonymized telemetry turned off."""
+    with patch("gpal.index.chromadb.PersistentClient") as client_cls:
+        CodebaseIndex(tmp_path, mock_client)
+    settings = client_cls.call_args.kwargs["settings"]
+    assert settings.anonymized_telemetry is False
+
+
+def test_reset_collections_applies_hnsw_tuning(simple_index):
+    """A recreated chunk collection carries the HNSW build and search params."""
+    simple_index.chroma = MagicMock()
+    simple_index._reset_collections()
+
+    code_call = simple_index.chroma.create_collection.call_args_list[0]
+    assert code_call.kwargs["name"] == "code"
+    metadata = code_call.kwargs["metadata"]
+    assert metadata["hnsw:space"] == "cosine"
+    assert metadata["hnsw:M"] == HNSW_M
+    assert metadata["hnsw:construction_ef"] == HNSW_CONSTRUCTION_EF
+    assert metadata["hnsw:search_ef"] == HNSW_SEARCH_EF
+    assert metadata["embedding_dim"] == EMBEDDING_DIM
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Incremental Indexing Tests
 # ─────────────────────────────────────────────────────────────────────────────
@@ -327,6 +630,27 @@ def test_update_file_metadata(simple_index, tmp_path):
     assert "size" in metadata
 
 
+def test_collect_files_reads_metadata_once(simple_index, tmp_path):
+    """Change detection uses one bulk metadata query for the whole walk."""
+    for name in ("same.py", "edited.py", "new.py"):
+        (tmp_path / name).write_text(f"# {name}")
+    same, edited = (tmp_path / "same.py").stat(), (tmp_path / "edited.py").stat()
+    simple_index.meta_collection = MagicMock()
+    simple_index.meta_collection.get.return_value = {
+        "ids": ["same.py", "edited.py"],
+        "metadatas": [
+            {"mtime": same.st_mtime, "size": same.st_size},
+            {"mtime": edited.st_mtime, "size": edited.st_size + 1},
+        ],
+    }
+
+    to_index, current = simple_index._collect_files()
+
+    assert sorted(p.name for p in to_index) == ["edited.py", "new.py"]
+    assert current == {"same.py", "edited.py", "new.py"}
+    simple_index.meta_collection.get.assert_called_once_with(include=["metadatas"])
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Dry Run Tests
 # ─────────────────────────────────────────────────────────────────────────────
@@ -471,3 +795,298 @@ def test_rebuild_force_clears_collections(simple_index, tmp_path):
     # Should have deleted both collections
     assert "code" in deleted_collections
     assert "file_metadata" in deleted_collections
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Embedding Batch Tests
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _fake_embed_response(contents):
+    """Build a fake embed_content response whose vectors encode the input text."""
+    response = MagicMock()
+    response.embeddings = [
+        MagicMock(values=[float(t.split()[-1]), 1.0] + [0.0] * (EMBEDDING_DIM - 2))
+        for t in contents
+    ]
+    return response
+
+
+def test_embed_multiple_batches_preserves_order(simple_index, mock_client):
+    """Concurrent batches are reassembled in input order."""
+    mock_client.models.embed_content.side_effect = (
+        lambda model, contents, config: _fake_embed_response(contents)
+    )
+    texts = [f"chunk {i}" for i in range(EMBEDDING_BATCH_SIZE * 2 + 5)]
+
+    embeddings = simple_index._embed(texts)
+
+    assert mock_client.models.embed_content.call_count == 3
+    # Vectors are normalized, so recover the encoded index from the ratio
+    assert [round(e[0] / e[1]) for e in embeddings] == list(range(len(texts)))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Batch API Rebuild Tests
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def test_rebuild_batch_adds_job_results(simple_index, tmp_path, mock_client):
+    """rebuild_batch uploads one request per chunk and stores the results."""
+    import json
+
+    (tmp_path / "a.py").write_text("print('a')")
+    (tmp_path / "b.py").write_text("print('b')")
+
+    simple_index.chroma = MagicMock()
+    simple_index.chroma.get_max_batch_size.return_value = 1000
+    simple_index.collection = MagicMock()
+    simple_index.collection.get.return_value = {"ids": []}
+    simple_index.meta_collection = MagicMock()
+    simple_index.meta_collection.get.return_value = {"ids": []}
+
+    uploaded_keys = []
+
+    def fake_upload(file, config):
+        with open(file, encoding="utf-8") as f:
+            uploaded_keys.extend(json.loads(line)["key"] for line in f)
+        return MagicMock(name="files/requests")
+
+    mock_client.files.upload.side_effect = fake_upload
+    job = MagicMock()
+    job.state.name = "JOB_STATE_SUCCEEDED"
+    mock_client.batches.create_embeddings.return_value = job
+    mock_client.files.download.side_effect = lambda file: "\n".join(
+        json.dumps({"key": k, "response": {"embedding": {"values": [0.1] * EMBEDDING_DIM}}})
+        for k in uploaded_keys
+    ).encode()
+
+    result = simple_index.rebuild_batch()
+
+    assert sorted(uploaded_keys) == ["a.py:1-1", "b.py:1-1"]
+    assert result["indexed"] == 2
+    assert result["chunks"] == 2
+    upsert_kwargs = simple_index.collection.upsert.call_args.kwargs
+    assert sorted(upsert_kwargs["ids"]) == ["a.py:1-1", "b.py:1-1"]
+    mock_client.models.embed_content.assert_not_called()
+
+
+def test_rebuild_batch_failed_job_raises(simple_index, tmp_path, mock_client):
+    """A batch job that doesn't succeed surfaces as RuntimeError."""
+    (tmp_path / "a.py").write_text("print('a')")
+
+    simple_index.chroma = MagicMock()
+    simple_index.collection = MagicMock()
+    simple_index.collection.get.return_value = {"ids": []}
+    simple_index.meta_collection = MagicMock()
+    simple_index.meta_collection.get.return_value = {"ids": []}
+    job = MagicMock()
+    job.state.name = "JOB_STATE_FAILED"
+    mock_client.batches.create_embeddings.return_value = job
+
+    with pytest.raises(RuntimeError, match="JOB_STATE_FAILED"):
+        simple_index.rebuild_batch()
+
+    # Nothing was deleted before the job came back empty-handed
+    simple_index.collection.delete.assert_not_called()
+    simple_index.meta_collection.delete.assert_not_called()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Content-Hash Incremental Tests
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _index_with_stored_chunks(index, stored_chunks):
+    """Point index.collection at a mock holding stored_chunks (with hashes)."""
+    index.collection = MagicMock()
+    index.collection.get.return_value = {
+        "ids": [c["id"] for c in stored_chunks],
+        "metadatas": [c["metadata"] for c in stored_chunks],
+        "embeddings": np.full((len(stored_chunks), EMBEDDING_DIM), 0.5, dtype=np.float32),
+    }
+    index.meta_collection = MagicMock()
+    index.meta_collection.get.return_value = {"ids": []}
+
+
+def test_chunk_metadata_includes_hash(simple_index, tmp_path):
+    """Chunks carry a content hash that changes with their text."""
+    f = tmp_path / "a.py"
+    f.write_text("one")
+    first = simple_index._chunk_file(f)[0]["metadata"]["hash"]
+    f.write_text("two")
+    second = simple_index._chunk_file(f)[0]["metadata"]["hash"]
+    assert first and second and first != second
+
+
+def test_rebuild_batch_skips_unchanged_chunks(simple_index, tmp_path, mock_client):
+    """Chunks whose hash is already stored are not sent to the batch job."""
+    f = tmp_path / "a.py"
+    f.write_text("print('a')")
+    _index_with_stored_chunks(simple_index, simple_index._chunk_file(f))
+    simple_index.chroma = MagicMock()
+    simple_index.chroma.get_max_batch_size.return_value = 1000
+    simple_index.collection.metadata = {"embedding_dim": EMBEDDING_DIM}
+
+    result = simple_index.rebuild_batch()
+
+    mock_client.batches.create_embeddings.assert_not_called()
+    assert result["indexed"] == 1
+    assert result["chunks"] == 0
+    simple_index.collection.delete.assert_not_called()
+
+
+def test_index_file_skips_unchanged_chunks(simple_index, tmp_path, mock_client):
+    """Re-indexing an unchanged file makes no embedding calls."""
+    f = tmp_path / "a.py"
+    f.write_text("print('a')")
+    _index_with_stored_chunks(simple_index, simple_index._chunk_file(f))
+
+    assert simple_index.index_file(f) == 1
+
+    mock_client.models.embed_content.assert_not_called()
+    simple_index.collection.upsert.assert_not_called()
+    simple_index.collection.delete.assert_not_called()
+
+
+def test_index_file_embeds_changed_chunks_and_drops_stale(simple_index, tmp_path, mock_client):
+    """Changed text is embedded and ids the file no longer produces are deleted."""
+    f = tmp_path / "a.py"
+    f.write_text("l1\nl2\nl3")
+    _index_with_stored_chunks(simple_index, simple_index._chunk_file(f))
+
+    f.write_text("l1\nl2")
+    mock_client.models.embed_content.side_effect = lambda model, contents, config: MagicMock(
+        embeddings=[MagicMock(values=[1.0] + [0.0] * (EMBEDDING_DIM - 1)) for _ in contents]
+    )
+
+    simple_index.index_file(f)
+
+    assert mock_client.models.embed_content.call_args.kwargs["contents"] == ["l1\nl2"]
+    assert simple_index.collection.upsert.call_args.kwargs["ids"] == ["a.py:1-2"]
+    simple_index.collection.delete.assert_called_once_with(ids=["a.py:1-3"])
+
+
+def test_index_file_reuses_embedding_for_moved_text(simple_index, tmp_path, mock_client):
+    """Text already embedded under another id reuses the stored vector."""
+    f = tmp_path / "a.py"
+    f.write_text("print('a')")
+    moved = simple_index._chunk_file(f)[0]
+    moved["id"] = "a.py:5-5"
+    _index_with_stored_chunks(simple_index, [moved])
+
+    simple_index.index_file(f)
+
+    mock_client.models.embed_content.assert_not_called()
+    upsert_kwargs = simple_index.collection.upsert.call_args.kwargs
+    assert upsert_kwargs["ids"] == ["a.py:1-1"]
+    assert np.array_equal(upsert_kwargs["embeddings"], np.full((1, EMBEDDING_DIM), 0.5))
+    simple_index.collection.delete.assert_called_once_with(ids=["a.py:5-5"])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Grouped Rebuild Writes Tests
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _rebuild_index(index, n_files, tmp_path):
+    """Write n_files one-line files and point the index at empty mock collections."""
+    for i in range(n_files):
+        (tmp_path / f"f{i}.py").write_text(f"x = {i}")
+    index.chroma = MagicMock()
+    index.chroma.get_max_batch_size.return_value = 1000
+    index.collection = MagicMock()
+    index.collection.get.return_value = {"ids": []}
+    index.collection.metadata = {"embedding_dim": EMBEDDING_DIM}
+    index.meta_collection = MagicMock()
+    index.meta_collection.get.return_value = {"ids": []}
+
+
+def test_rebuild_sync_writes_files_together(simple_index, tmp_path, mock_client):
+    """One embedding call and one upsert cover many small files."""
+    _rebuild_index(simple_index, 5, tmp_path)
+    mock_client.models.embed_content.side_effect = (
+        lambda model, contents, config: _fake_embed_response([f"c {i}" for i in range(len(contents))])
+    )
+
+    result = simple_index._rebuild_sync()
+
+    assert result["indexed"] == 5
+    assert mock_client.models.embed_content.call_count == 1
+    simple_index.collection.upsert.assert_called_once()
+    upsert_kwargs = simple_index.collection.upsert.call_args.kwargs
+    assert sorted(upsert_kwargs["ids"]) == [f"f{i}.py:1-1" for i in range(5)]
+    assert upsert_kwargs["embeddings"].shape == (5, EMBEDDING_DIM)
+    simple_index.meta_collection.upsert.assert_called_once()
+    assert len(simple_index.meta_collection.upsert.call_args.kwargs["ids"]) == 5
+
+
+def test_rebuild_async_writes_files_together(simple_index, tmp_path, mock_client):
+    """The async rebuild batches embeddings and writes the same way."""
+    _rebuild_index(simple_index, 3, tmp_path)
+
+    async def fake_embed(model, contents, config):
+        return _fake_embed_response([f"c {i}" for i in range(len(contents))])
+
+    mock_client.aio.models.embed_content.side_effect = fake_embed
+
+    result = simple_index.rebuild()
+
+    assert result["indexed"] == 3
+    assert mock_client.aio.models.embed_content.call_count == 1
+    simple_index.collection.upsert.assert_called_once()
+    simple_index.meta_collection.upsert.assert_called_once()
+
+
+def test_rebuild_sends_full_embedding_batches(simple_index, tmp_path, mock_client):
+    """Chunks from many files share full requests; only the last is partial."""
+    n_files = 2 * EMBEDDING_BATCH_SIZE + EMBEDDING_BATCH_SIZE // 2
+    _rebuild_index(simple_index, n_files, tmp_path)
+    mock_client.models.embed_content.side_effect = (
+        lambda model, contents, config: _fake_embed_response([f"c {i}" for i in range(len(contents))])
+    )
+
+    result = simple_index._rebuild_sync()
+
+    assert result["indexed"] == n_files
+    batch_sizes = [len(c.kwargs["contents"]) for c in mock_client.models.embed_content.call_args_list]
+    assert sum(batch_sizes) == n_files
+    assert len(batch_sizes) == -(-n_files // EMBEDDING_BATCH_SIZE)
+    assert max(batch_sizes) == EMBEDDING_BATCH_SIZE
+
+
+def test_remove_stale_files_deletes_in_bulk(simple_index):
+    """Stale files are removed with one chunk delete and one metadata delete."""
+    simple_index.chroma = MagicMock()
+    simple_index.chroma.get_max_batch_size.return_value = 1000
+    simple_index.collection = MagicMock()
+    simple_index.meta_collection = MagicMock()
+    simple_index.meta_collection.get.return_value = {"ids": ["a.py", "b.py", "c.py"]}
+
+    assert simple_index._remove_stale_files({"b.py"}) == 2
+
+    simple_index.collection.delete.assert_called_once_with(where={"file": {"$in": ["a.py", "c.py"]}})
+    simple_index.meta_collection.delete.assert_called_once_with(ids=["a.py", "c.py"])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Search Tests
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def test_search_queries_limit_results(simple_index, mock_client):
+    """search() asks chroma for exactly `limit` results; HNSW_SEARCH_EF sets the pool."""
+    mock_client.models.embed_content.return_value = _fake_embed_response(["q 1"])
+    simple_index.collection = MagicMock()
+    simple_index.collection.query.return_value = {
+        "documents": [[f"doc {i}" for i in range(2)]],
+        "metadatas": [[{"file": f"f{i}.py", "start_line": 1, "end_line": 2} for i in range(2)]],
+        "distances": [[0.1 * i for i in range(2)]],
+    }
+
+    matches = simple_index.search("query", limit=2)
+
+    query_kwargs = simple_index.collection.query.call_args.kwargs
+    assert query_kwargs["n_results"] == 2
+    assert [m["file"] for m in matches] == ["f0.py", "f1.py"]
+    assert matches[0]["score"] == 1.0
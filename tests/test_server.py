@@ -13,14 +13,16 @@ import pytest
 from pathlib import Path
 
 from fastmcp import Client
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from gpal.server import (
     mcp, _validate_input_path, _validate_output_path,
     record_tokens, tokens_in_window, token_stats, GeminiResponse,
     _sync_throttle, _async_throttle, _KNOWN_MODELS, MODEL_SEARCH,
     MODEL_LITE, RATE_LIMITS_TPM, _afc_local, _send_with_retry, _EXECUTOR,
     _extract_retry_delay, _is_retriable_genai_error,
-    search_project,
+    search_project, _load_context_parts, _load_uri_parts, get_client, create_chat,
+    _SessionCache, _load_persisted_history, _session_file, _SESSION_IO,
+    _prune_spilled_sessions,
 )
 
 
@@ -542,3 +544,372 @@ def test_search_project_rejects_traversal_glob(tmp_path, monkeypatch):
     monkeypatch.chdir(tmp_path)
     result = search_project("test", glob_pattern="../../**/*")
     assert ".." in result
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# M. Context File Loading
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_load_context_parts_preserves_order(tmp_path, monkeypatch):
+    """Files read concurrently still come back in argument order."""
+    monkeypatch.chdir(tmp_path)
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text(f"content of {name}")
+
+    parts = await _load_context_parts(["a.txt", "b.txt", "c.txt"], None)
+
+    assert isinstance(parts, list)
+    assert [p.text.splitlines()[0] for p in parts] == [
+        "--- START FILE: a.txt ---",
+        "--- START FILE: b.txt ---",
+        "--- START FILE: c.txt ---",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_load_context_parts_wraps_content(tmp_path, monkeypatch):
+    """Text parts carry the exact file content between the markers."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_bytes("héllo\nworld".encode() + b"\xff")
+    (tmp_path / "empty.txt").write_bytes(b"")
+
+    parts = await _load_context_parts(["a.txt", "empty.txt"], None)
+
+    assert parts[0].text == (
+        "--- START FILE: a.txt ---\nhéllo\nworld\ufffd\n--- END FILE: a.txt ---\n"
+    )
+    assert parts[1].text == "--- START FILE: empty.txt ---\n\n--- END FILE: empty.txt ---\n"
+
+
+@pytest.mark.asyncio
+async def test_load_context_parts_normalizes_newlines(tmp_path, monkeypatch):
+    """CRLF and lone CR reach the model as LF, as read_file returns them."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_bytes(b"one\r\ntwo\rthree\n")
+
+    parts = await _load_context_parts(["a.txt"], None)
+
+    assert parts[0].text == (
+        "--- START FILE: a.txt ---\none\ntwo\nthree\n\n--- END FILE: a.txt ---\n"
+    )
+
+
+@pytest.mark.asyncio
+async def test_load_context_parts_reads_to_eof(tmp_path, monkeypatch):
+    """A file larger than its fstat size (it grew) is still attached whole."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("0123456789")
+    ino = (tmp_path / "a.txt").stat().st_ino
+    real_fstat = os.fstat
+
+    def stale_fstat(fd):
+        st = real_fstat(fd)
+        return MagicMock(st_size=3) if st.st_ino == ino else st
+
+    monkeypatch.setattr("gpal.server.os.fstat", stale_fstat)
+
+    parts = await _load_context_parts(["a.txt"], None)
+
+    assert "\n0123456789\n" in parts[0].text
+
+
+@pytest.mark.asyncio
+async def test_load_context_parts_returns_first_error(tmp_path, monkeypatch):
+    """A missing file surfaces as an error string, not an exception."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("ok")
+
+    result = await _load_context_parts(["a.txt", "missing.txt"], None)
+
+    assert isinstance(result, str)
+    assert result.startswith("Error reading file 'missing.txt'")
+
+
+@pytest.mark.asyncio
+async def test_load_uri_parts_resolves_mime_in_order():
+    """Uncached URIs are looked up via the Files API; order is preserved."""
+    client = MagicMock()
+    client.files.get.side_effect = lambda name: MagicMock(mime_type=f"mime/{name.split('/')[-1]}")
+    uris = [f"https://example.invalid/v1beta/files/f{i}" for i in range(4)]
+
+    parts = await _load_uri_parts(client, uris)
+
+    assert [p.file_data.file_uri for p in parts] == uris
+    assert [p.file_data.mime_type for p in parts] == [f"mime/f{i}" for i in range(4)]
+    assert await _load_uri_parts(client, None) == []
+
+
+@pytest.mark.asyncio
+async def test_load_context_parts_rejects_outside_root(tmp_path, monkeypatch):
+    """Paths are validated before anything is read."""
+    monkeypatch.chdir(tmp_path)
+    result = await _load_context_parts(None, ["/etc/passwd"])
+    assert "denied" in result.lower()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# N. Shared Client
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _fresh_client(monkeypatch):
+    """Start from no shared client; monkeypatch restores the real one afterwards."""
+    monkeypatch.setattr("gpal.server._client", None)
+    monkeypatch.setattr("gpal.server._client_key", None)
+
+
+def test_get_client_reuses_instance(monkeypatch):
+    """Repeated calls share one client (and its connection pool)."""
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key-1")
+    _fresh_client(monkeypatch)
+    assert get_client() is get_client()
+
+
+def test_get_client_rebuilds_on_key_change(monkeypatch):
+    """A new API key yields a fresh client."""
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key-1")
+    _fresh_client(monkeypatch)
+    first = get_client()
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key-2")
+    assert get_client() is not first
+
+
+def test_replaced_client_lives_as_long_as_its_chats(monkeypatch):
+    """A replaced client isn't closed under a live chat, and is freed after it."""
+    import gc
+    import weakref
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key-1")
+    _fresh_client(monkeypatch)
+    first = weakref.ref(get_client())
+    chat = create_chat(first(), "gemini-test")
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key-2")
+    get_client()
+    gc.collect()
+    assert first() is not None
+
+    del chat
+    gc.collect()
+    assert first() is None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# O. Session Spill to Disk
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _fake_session(*texts):
+    """A stand-in chat whose curated history alternates user/model turns."""
+    from google.genai import types
+
+    session = MagicMock()
+    session._gpal_model = "gemini-test"
+    session._curated_history = [
+        types.Content(role="user" if i % 2 == 0 else "model", parts=[types.Part.from_text(text=t)])
+        for i, t in enumerate(texts)
+    ]
+    return session
+
+
+def _flush_spills():
+    """Wait for queued spill writes (the session I/O worker runs tasks in order)."""
+    _SESSION_IO.submit(lambda: None).result()
+
+
+def test_evicted_session_is_persisted_and_restored(tmp_path, monkeypatch):
+    """LRU eviction writes history to disk; loading it consumes the file."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    cache = _SessionCache(maxsize=1, ttl=3600)
+    old = _fake_session("hello", "hi there")
+    cache["old"] = (old, None)
+    cache["new"] = (_fake_session("x", "y"), None)
+
+    assert "old" not in cache
+    _flush_spills()
+    assert _session_file("old").exists()
+
+    history = _load_persisted_history("old")
+    assert [c.parts[0].text for c in history] == ["hello", "hi there"]
+    assert not _session_file("old").exists()
+    assert _load_persisted_history("old") is None
+
+
+def test_expired_session_is_persisted(tmp_path, monkeypatch):
+    """TTL expiry spills too, and a trailing user turn is dropped on restore."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    now = [0.0]
+    cache = _SessionCache(maxsize=10, ttl=10, timer=lambda: now[0])
+    cache["s"] = (_fake_session("q1", "a1", "dangling"), None)
+
+    now[0] = 11.0
+    cache.expire()
+
+    history = _SESSION_IO.submit(_load_persisted_history, "s").result()
+    assert [c.role for c in history] == ["user", "model"]
+
+
+@pytest.mark.asyncio
+async def test_get_session_restores_expired_history(tmp_path, monkeypatch):
+    """A lookup miss queues the restore behind the spill that expire() just queued."""
+    import gpal.server as server
+
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    now = [0.0]
+    cache = _SessionCache(maxsize=10, ttl=10, timer=lambda: now[0])
+    monkeypatch.setattr(server, "sessions", cache)
+    cache["s"] = (_fake_session("q1", "a1"), None)
+    now[0] = 11.0
+
+    created = {}
+
+    def fake_create_chat(client, model_name, history=None, config=None):
+        created["history"] = history
+        return MagicMock()
+
+    monkeypatch.setattr(server, "create_chat", fake_create_chat)
+    ctx = MagicMock()
+    ctx.session_id = "s"
+
+    session, lock = await server.get_session(ctx, MagicMock(), "flash")
+
+    assert [c.parts[0].text for c in created["history"]] == ["q1", "a1"]
+    assert cache["s"] == (session, lock)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_get_session_shares_one_restore(tmp_path, monkeypatch):
+    """A second first-call waits on the in-flight restore instead of starting empty."""
+    import asyncio
+    import threading
+    import gpal.server as server
+
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    now = [0.0]
+    cache = _SessionCache(maxsize=10, ttl=10, timer=lambda: now[0])
+    monkeypatch.setattr(server, "sessions", cache)
+    cache["s"] = (_fake_session("q1", "a1"), None)
+    now[0] = 11.0
+
+    created = []
+
+    def fake_create_chat(client, model_name, history=None, config=None):
+        created.append(history)
+        return MagicMock()
+
+    loads = []
+
+    def counting_load(session_id):
+        loads.append(session_id)
+        return _load_persisted_history(session_id)
+
+    monkeypatch.setattr(server, "create_chat", fake_create_chat)
+    monkeypatch.setattr(server, "_load_persisted_history", counting_load)
+    ctx = MagicMock()
+    ctx.session_id = "s"
+
+    # Hold the session worker so both calls miss while the restore is queued
+    gate = threading.Event()
+    _SESSION_IO.submit(gate.wait)
+    try:
+        first = asyncio.create_task(server.get_session(ctx, MagicMock(), "flash"))
+        second = asyncio.create_task(server.get_session(ctx, MagicMock(), "flash"))
+        await asyncio.sleep(0.05)
+    finally:
+        gate.set()
+    (s1, l1), (s2, l2) = await asyncio.gather(first, second)
+
+    assert loads == ["s"]
+    assert len(created) == 1
+    assert [c.parts[0].text for c in created[0]] == ["q1", "a1"]
+    assert (s1, l1) == (s2, l2) == cache["s"]
+    assert server._session_restores == {}
+
+
+def test_spill_is_written_off_the_caller_thread(tmp_path, monkeypatch):
+    """Eviction only queues the write; serialization runs on the session I/O worker."""
+    import threading
+
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    writers = []
+    real_dumps = __import__("orjson").dumps
+    monkeypatch.setattr(
+        "gpal.server.orjson.dumps",
+        lambda obj: writers.append(threading.current_thread().name) or real_dumps(obj),
+    )
+    cache = _SessionCache(maxsize=1, ttl=3600)
+    cache["a"] = (_fake_session("q", "a"), None)
+    cache["b"] = (_fake_session("q", "a"), None)
+    _flush_spills()
+
+    assert len(writers) == 1 and writers[0].startswith("gpal-session")
+
+
+def test_spilled_files_are_private(tmp_path, monkeypatch):
+    """Spilled histories may quote file contents: owner-only directory and files."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    cache = _SessionCache(maxsize=1, ttl=3600)
+    cache["a"] = (_fake_session("q", "a"), None)
+    cache["b"] = (_fake_session("q", "a"), None)
+    _flush_spills()
+
+    path = _session_file("a")
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert path.parent.stat().st_mode & 0o777 == 0o700
+
+
+def test_prune_spilled_sessions_by_age_and_count(tmp_path, monkeypatch):
+    """Old files go first, then everything past the newest N."""
+    monkeypatch.setattr("gpal.server.SESSION_SPILL_MAX_FILES", 2)
+    now = time.time()
+    ages = {"stale": 30 * 24 * 3600, "a": 30, "b": 20, "c": 10}
+    for name, age in ages.items():
+        f = tmp_path / f"{name}.json"
+        f.write_text("{}")
+        os.utime(f, (now - age, now - age))
+    _prune_spilled_sessions(tmp_path)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["b.json", "c.json"]
+
+
+def test_prune_spilled_sessions_includes_orphaned_tmp(tmp_path, monkeypatch):
+    """Leftover .tmp files from interrupted writes are pruned by age and count."""
+    monkeypatch.setattr("gpal.server.SESSION_SPILL_MAX_FILES", 2)
+    now = time.time()
+    ages = {"stale.tmp": 30 * 24 * 3600, "old.tmp": 30, "b.json": 20, "c.tmp": 10}
+    for name, age in ages.items():
+        f = tmp_path / name
+        f.write_text("{}")
+        os.utime(f, (now - age, now - age))
+    (tmp_path / "notes.txt").write_text("not ours")
+
+    _prune_spilled_sessions(tmp_path)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["b.json", "c.tmp", "notes.txt"]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# P. Import Cost
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def test_server_import_defers_index_stack():
+    """Starting the server must not pay for chromadb/numpy until an index is used."""
+    import subprocess
+    import sys
+
+    heavy = ("gpal.index", "chromadb", "numpy")
+    code = (
+        "import sys, gpal.server; "
+        f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
@@ -1,7 +1,13 @@
 import os
+import shutil
+import subprocess
 import pytest
 from pathlib import Path
-from gpal.server import list_directory, read_file, search_project, detect_mime_type, MIME_TYPES
+import glob as globlib
+from gpal.server import (
+    list_directory, read_file, search_project, detect_mime_type, MIME_TYPES,
+    MAX_SEARCH_MATCHES, _rg_glob_args, _walk_name_glob,
+)
 
 def test_list_directory(tmp_path, monkeypatch):
     # Create a dummy structure
@@ -19,6 +25,19 @@ def test_list_directory(tmp_path, monkeypatch):
     assert "file2.py" in results
     assert len(results) == 3
 
+def test_list_directory_sorted(tmp_path, monkeypatch):
+    for name in ("b.txt", "a.txt", "c"):
+        (tmp_path / name).write_text("x")
+    monkeypatch.chdir(tmp_path)
+    assert list_directory(".") == ["a.txt", "b.txt", "c"]
+
+def test_list_directory_on_file(tmp_path, monkeypatch):
+    (tmp_path / "file.txt").write_text("x")
+    monkeypatch.chdir(tmp_path)
+    result = list_directory("file.txt")
+    assert isinstance(result, str)
+    assert result.startswith("Error listing directory")
+
 def test_list_directory_nonexistent(tmp_path, monkeypatch):
     monkeypatch.chdir(tmp_path)
     result = list_directory("non_existent_subdir")
@@ -41,6 +60,23 @@ def test_read_file_error(tmp_path, monkeypatch):
     result = read_file("this_file_does_not_exist_at_all.txt")
     assert "does not exist" in result
 
+def test_read_file_size_limit(tmp_path, monkeypatch):
+    (tmp_path / "fits.txt").write_text("x" * 8)
+    (tmp_path / "big.txt").write_text("x" * 9)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("gpal.server.MAX_FILE_SIZE", 8)
+
+    assert read_file("fits.txt") == "x" * 8
+    assert "exceeds" in read_file("big.txt")
+
+def test_read_file_decoding(tmp_path, monkeypatch):
+    (tmp_path / "crlf.txt").write_bytes(b"a\r\nb\rc\n\xff")
+    (tmp_path / "sub").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    assert read_file("crlf.txt") == "a\nb\nc\n\ufffd"
+    assert read_file("sub").startswith("Error reading file")
+
 def test_search_project(tmp_path, monkeypatch):
     # Setup dummy files
     (tmp_path / "app").mkdir()
@@ -67,6 +103,164 @@ def test_search_project_no_matches(tmp_path, monkeypatch):
     result = search_project("non_existent_term_xyz_123")
     assert result == "No matches found."
 
+def test_search_project_truncates_in_path_order(tmp_path, monkeypatch):
+    for i in range(30):
+        (tmp_path / f"f{i:02d}.txt").write_text("needle")
+    monkeypatch.chdir(tmp_path)
+
+    result = search_project("needle", glob_pattern="f*.txt").splitlines()
+    assert len(result) == MAX_SEARCH_MATCHES + 1
+    assert result[-1] == "... (truncated)"
+    # Parallel scanning must not reorder results
+    expected = [f"Match in: {f}" for f in sorted(globlib.glob("f*.txt"))]
+    assert result[:-1] == expected[:MAX_SEARCH_MATCHES]
+
+def test_search_project_exact_cap_is_not_truncated(tmp_path, monkeypatch):
+    for i in range(MAX_SEARCH_MATCHES):
+        (tmp_path / f"f{i:02d}.txt").write_text("needle")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("gpal.server._RG_PATH", None)
+
+    result = search_project("needle").splitlines()
+    assert len(result) == MAX_SEARCH_MATCHES
+    assert "... (truncated)" not in result
+
+def test_search_project_too_many_files(tmp_path, monkeypatch):
+    for i in range(5):
+        (tmp_path / f"f{i}.txt").write_text("nothing here")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("gpal.server.MAX_SEARCH_FILES", 3)
+    monkeypatch.setattr("gpal.server._RG_PATH", None)  # limit only bounds the Python scan
+
+    result = search_project("needle")
+    assert result.startswith("Error: Too many files")
+
+def test_search_project_binary_and_empty_files(tmp_path, monkeypatch):
+    (tmp_path / "empty.txt").write_text("")
+    (tmp_path / "blob.bin").write_bytes(b"\xff\xfe needle \x00")
+    (tmp_path / "utf8.txt").write_text("caf\u00e9 au lait", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    assert search_project("needle") == "Match in: blob.bin"
+    assert search_project("caf\u00e9") == "Match in: utf8.txt"
+
+def test_search_project_without_ripgrep(tmp_path, monkeypatch):
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "main.py").write_text("def my_function(): pass")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("gpal.server._RG_PATH", None)
+
+    assert search_project("my_function") == "Match in: app/main.py"
+
+@pytest.mark.parametrize("use_rg", [True, False])
+def test_search_project_term_is_literal(tmp_path, monkeypatch, use_rg):
+    (tmp_path / "dot.txt").write_text("call a.b(x)")
+    (tmp_path / "any.txt").write_text("call axb(x)")
+    monkeypatch.chdir(tmp_path)
+    if not use_rg:
+        monkeypatch.setattr("gpal.server._RG_PATH", None)
+    elif shutil.which("rg") is None:
+        pytest.skip("ripgrep not installed")
+
+    assert search_project("a.b(") == "Match in: dot.txt"
+
+@pytest.mark.parametrize("pattern,expected", [
+    ("**/*", []),
+    ("**/*.py", ["--glob", "*.py"]),
+    ("**/test_?.py", ["--glob", "test_?.py"]),
+    ("*.py", None),
+    ("src/**/*.py", None),
+    ("**/.env", None),
+    ("**/*.{py,md}", None),
+])
+def test_rg_glob_args(pattern, expected):
+    assert _rg_glob_args(pattern) == expected
+
+def test_search_project_passes_name_glob_to_ripgrep(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("gpal.server._RG_PATH", "rg")
+    calls = []
+
+    def fake_run(args, **kwargs):
+        calls.append(args)
+        return subprocess.CompletedProcess(args, 0, stdout="./b.py\n./a/c.py\n", stderr="")
+
+    monkeypatch.setattr("gpal.server.subprocess.run", fake_run)
+
+    assert search_project("needle", "**/*.py") == "Match in: a/c.py\nMatch in: b.py"
+    assert calls[0][calls[0].index("--glob") + 1] == "*.py"
+
+@pytest.mark.parametrize("name_glob", ["*", "*.py", "test_?.py"])
+def test_walk_name_glob_matches_iglob(tmp_path, monkeypatch, name_glob):
+    for rel in ("a.py", "test_1.py", "b/c.py", "b/d/test_2.py", "b/e.txt",
+                "z/y.py", ".hidden/x.py", "b/.secret.py"):
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("x")
+    monkeypatch.chdir(tmp_path)
+
+    expected = [
+        f for f in globlib.glob(f"**/{name_glob}", recursive=True) if Path(f).is_file()
+    ]
+    assert list(_walk_name_glob(name_glob, tmp_path.resolve())) == expected
+
+def test_walk_name_glob_skips_symlinks(tmp_path, monkeypatch):
+    outside = tmp_path / "outside"
+    (outside / "pkg").mkdir(parents=True)
+    (outside / "pkg" / "mod.py").write_text("x")
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "inner.py").write_text("x")
+    (root / "escape.py").symlink_to(outside / "pkg" / "mod.py")
+    (root / "alias.py").symlink_to(root / "inner.py")
+    (root / "linked").symlink_to(outside / "pkg", target_is_directory=True)
+    monkeypatch.chdir(root)
+
+    assert list(_walk_name_glob("*.py", root.resolve())) == ["inner.py"]
+
+def test_search_project_ripgrep_and_python_scan_agree(tmp_path, monkeypatch):
+    """With rg stubbed, both paths give the same order, cap and symlink handling."""
+    for rel in [f"d{i % 3}/f{i:02d}.py" for i in range(MAX_SEARCH_MATCHES + 5)]:
+        (tmp_path / rel).parent.mkdir(exist_ok=True)
+        (tmp_path / rel).write_text("needle")
+    (tmp_path / "a_link.py").symlink_to(tmp_path / "d0" / "f00.py")
+    monkeypatch.chdir(tmp_path)
+
+    # What rg prints: unordered (it searches in parallel), no symlinks
+    rg_out = "".join(
+        f"./{p.relative_to(tmp_path)}\n"
+        for p in reversed(sorted(tmp_path.rglob("*.py"))) if not p.is_symlink()
+    )
+    monkeypatch.setattr("gpal.server._RG_PATH", "rg")
+    monkeypatch.setattr(
+        "gpal.server.subprocess.run",
+        lambda args, **kw: subprocess.CompletedProcess(args, 0, stdout=rg_out, stderr=""),
+    )
+    with_rg = [search_project("needle", g) for g in ("**/*", "**/*.py")]
+    monkeypatch.setattr("gpal.server._RG_PATH", None)
+    without_rg = [search_project("needle", g) for g in ("**/*", "**/*.py")]
+
+    assert with_rg == without_rg
+    lines = with_rg[0].splitlines()
+    assert lines[0] == "Match in: d0/f00.py"
+    assert lines[-1] == "... (truncated)"
+    assert len(lines) == MAX_SEARCH_MATCHES + 1
+
+@pytest.mark.skipif(shutil.which("rg") is None, reason="ripgrep not installed")
+def test_search_project_ripgrep_matches_python_scan(tmp_path, monkeypatch):
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "main.py").write_text("def my_function(): pass")
+    (tmp_path / "app" / "utils.py").write_text("my_function()")
+    (tmp_path / ".hidden.py").write_text("my_function")
+    (tmp_path / ".gitignore").write_text("app/\n")
+    monkeypatch.chdir(tmp_path)
+
+    with_rg = [search_project("my_function", g) for g in ("**/*", "**/*.py")]
+    monkeypatch.setattr("gpal.server._RG_PATH", None)
+    without_rg = [search_project("my_function", g) for g in ("**/*", "**/*.py")]
+
+    assert with_rg == without_rg
+    assert "Match in: app/main.py" in with_rg
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # MIME Type Detection Tests